@@ -74,7 +74,7 @@ def decode_plan(translator: StateTranslator, plan_actions: List[str],
     })()
     
     translator.env = mock_env
-    translator.action_buffer = []  # Clear buffer
+    translator.clear_buffer()
     
     all_minigrid_actions = []
     current_pos = list(start_pos)
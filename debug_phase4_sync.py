@@ -154,7 +154,7 @@ def test_step_1_turn_tolerance():
     
     # Get micro-actions for this PDDL action
     mock_agent = type('MockAgent', (), {'pos': env.agent_pos, 'dir': env.agent_dir})()
-    translator.action_buffer = []  # Clear buffer
+    translator.clear_buffer()
     translator.env.agent_pos = env.agent_pos
     translator.env.agent_dir = env.agent_dir
     
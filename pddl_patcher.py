@@ -3,9 +3,38 @@ PDDL Patcher - Safe PDDL Problem File Updates
 Handles dynamic addition of objects and predicates to PDDL problem files.
 """
 
+from functools import lru_cache
+from itertools import product
 from typing import List, Tuple
+import mmap
+import os
 import re
 
+from state_manager import to_pddl
+
+# Files above this size are searched through a read-only mmap instead of
+# being copied into a Python string (grids with full connectivity grow large)
+MMAP_THRESHOLD = 64 * 1024
+
+# Matches every (clear loc_X_Y) predicate plus trailing whitespace
+_ALL_CLEAR_RE = re.compile(r'\(clear\s+(loc_\d+_\d+)\)\s*')
+
+# Matches every (blocked loc_X_Y) predicate plus trailing whitespace
+_ALL_BLOCKED_RE = re.compile(r'\(blocked (loc_\d+_\d+)\)\s*')
+
+# Top-level S-expression inside :init, allowing one nested level
+_INIT_PRED_RE = re.compile(r'\((?:[^()]|\([^()]*\))*\)')
+
+
+@lru_cache(maxsize=8)
+def grid_locations_str(width: int, height: int) -> str:
+    """
+    Space-separated loc_X_Y names for every grid cell (x-major order), as used
+    in the :objects section. Cached per grid size since every run of a maze
+    size produces the same string.
+    """
+    return " ".join(f"loc_{x}_{y}" for x, y in product(range(width), range(height)))
+
 
 def scale_price_to_int(raw_price) -> int:
     """
@@ -51,6 +80,37 @@ def validate_no_fractional_numbers(predicate: str) -> Tuple[bool, str]:
     return True, ""
 
 
+def _file_contains(path: str, needle: str, ignore_case: bool = False) -> bool:
+    """
+    Check whether a PDDL file contains a substring without decoding it.
+
+    Large files are mapped read-only so the search runs directly on the
+    page cache; small (or empty, which mmap rejects) files are read as bytes.
+    Raises the same OSError subclasses as open() for missing/unreadable files.
+    """
+    pattern = needle.encode()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if ignore_case:
+                    return re.search(re.escape(pattern), mm, re.IGNORECASE) is not None
+                return mm.find(pattern) != -1
+        data = f.read()
+    if ignore_case:
+        return pattern.lower() in data.lower()
+    return pattern in data
+
+
+def _split_init_predicates(text: str) -> List[str]:
+    """
+    Split the body of an (:init ...) block into its top-level predicates.
+
+    Handles one level of nesting, which covers numeric fluents such as
+    (= (item-price store item) 35).
+    """
+    return _INIT_PRED_RE.findall(text)
+
+
 class PDDLPatcher:
     """
     Safe PDDL problem file patching with idempotent operations.
@@ -64,6 +124,10 @@ class PDDLPatcher:
             pddl_file_path: Path to the problem.pddl file
         """
         self.pddl_file_path = pddl_file_path
+        # (from_loc, to_loc) pairs written by init_grid_connectivity; None until then
+        self._connected_set = None
+        # (pos, mtime_ns, size) after update_agent_position last wrote the file
+        self._agent_pos_written = None
 
     def add_blocked_location(self, position: Tuple[int, int]) -> bool:
         """
@@ -73,6 +137,11 @@ class PDDLPatcher:
         blocked_predicate = f"(blocked loc_{position[0]}_{position[1]})"
 
         try:
+            # Check if predicate already exists before decoding the file
+            if _file_contains(self.pddl_file_path, blocked_predicate):
+                print(f"[PDDL] Blocked predicate {blocked_predicate} already exists")
+                return True
+
             # Read current content
             with open(self.pddl_file_path, 'r') as f:
                 content = f.read()
@@ -80,11 +149,6 @@ class PDDLPatcher:
             print(f"[PDDL] Error reading PDDL file: {e}")
             return False
 
-        # Check if predicate already exists
-        if blocked_predicate in content:
-            print(f"[PDDL] Blocked predicate {blocked_predicate} already exists")
-            return True
-
         # Find the :init section and add the predicate INSIDE it
         init_start = content.find("(:init")
         if init_start == -1:
@@ -120,12 +184,74 @@ class PDDLPatcher:
             print(f"[PDDL] Error writing PDDL file: {e}")
             return False
 
+    def add_blocked_locations(self, positions) -> bool:
+        """
+        Add blocked location predicates for several positions in one read/write.
+        Batch version of add_blocked_location; positions already blocked are skipped.
+        """
+        try:
+            with open(self.pddl_file_path, 'r') as f:
+                content = f.read()
+        except (FileNotFoundError, PermissionError, IOError) as e:
+            print(f"[PDDL] Error reading PDDL file: {e}")
+            return False
+
+        new_predicates = []
+        for position in sorted(set(positions)):
+            blocked_predicate = f"(blocked loc_{position[0]}_{position[1]})"
+            if blocked_predicate in content:
+                print(f"[PDDL] Blocked predicate {blocked_predicate} already exists")
+            else:
+                new_predicates.append(blocked_predicate)
+        if not new_predicates:
+            return True
+
+        # Find the closing ) of :init section by tracking nested parentheses
+        init_start = content.find("(:init")
+        if init_start == -1:
+            print(f"[PDDL] Could not find :init section")
+            return False
+
+        depth = 0
+        init_end = None
+        for i in range(init_start, len(content)):
+            char = content[i]
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    init_end = i
+                    break
+
+        if init_end is None:
+            print(f"[PDDL] Could not find closing ) for :init section")
+            return False
+
+        # Insert all predicates INSIDE :init, before the closing )
+        text = "".join(f"\n    {p}" for p in new_predicates)
+        new_content = content[:init_end] + text + content[init_end:]
+
+        try:
+            with open(self.pddl_file_path, 'w') as f:
+                f.write(new_content)
+            print(f"[PDDL] Added {len(new_predicates)} blocked locations: {' '.join(new_predicates)}")
+            return True
+        except (PermissionError, IOError) as e:
+            print(f"[PDDL] Error writing PDDL file: {e}")
+            return False
+
     def add_new_object(self, obj_name: str, obj_type: str, predicates: List[str], agent_pos: Tuple[int, int] = None) -> bool:
         """
         Idempotent PDDL object addition - safely add or skip if already exists.
         Returns True if object is now in PDDL (either added or already present).
         """
         try:
+            # Check if object already exists (case-insensitive search)
+            if _file_contains(self.pddl_file_path, obj_name, ignore_case=True):
+                print(f"[PDDL] Object '{obj_name}' already exists in PDDL file, skipping addition")
+                return True  # Success - object is already there
+
             # Read current content
             with open(self.pddl_file_path, 'r') as f:
                 content = f.read()
@@ -133,14 +259,6 @@ class PDDLPatcher:
             print(f"[PDDL] Error reading PDDL file: {e}")
             return False
 
-        # Check if object already exists (case-insensitive search)
-        obj_name_lower = obj_name.lower()
-        content_lower = content.lower()
-
-        if obj_name_lower in content_lower:
-            print(f"[PDDL] Object '{obj_name}' already exists in PDDL file, skipping addition")
-            return True  # Success - object is already there
-
         # Object doesn't exist, try to add it
         try:
             # Find the :objects section and add the new object
@@ -181,12 +299,24 @@ class PDDLPatcher:
 
     def update_agent_position(self, agent_pos):
         """Updates the (at_agent agent ...) predicate in the PDDL file to current pos."""
-        # Use inject_dynamic_state first to ensure proper structure
-        new_pred = f"(at_agent agent loc_{agent_pos[0]}_{agent_pos[1]})"
-        if self.inject_dynamic_state([new_pred]):
-            return True
+        pos = (int(agent_pos[0]), int(agent_pos[1]))
+        new_pred = f"(at_agent agent loc_{pos[0]}_{pos[1]})"
+        # Nothing to do if our last write already put the agent here and the
+        # file hasn't been touched since. The stat only hints at that (a same-size
+        # rewrite within the mtime granularity keeps it), so confirm the fact is there
+        if self._agent_pos_written and self._agent_pos_written[0] == pos:
+            try:
+                st = os.stat(self.pddl_file_path)
+                if (self._agent_pos_written[1:] == (st.st_mtime_ns, st.st_size)
+                        and _file_contains(self.pddl_file_path, new_pred)):
+                    return True
+            except OSError:
+                pass
+        self._agent_pos_written = None
 
-        # Fallback: direct replace/insert if inject failed
+        # Direct replace/insert of the single at_agent fact. Not inject_dynamic_state:
+        # that treats its input as the whole dynamic state and would strip the
+        # discovered stores' (at_store ...)/(selling ...) facts
         try:
             with open(self.pddl_file_path, 'r') as f:
                 content = f.read()
@@ -206,11 +336,17 @@ class PDDLPatcher:
 
             with open(self.pddl_file_path, 'w') as f:
                 f.write(content)
+            self._remember_agent_pos(pos)
             return True
         except Exception as e:
             print(f"[PDDL] Error updating agent position: {e}")
             return False
 
+    def _remember_agent_pos(self, pos):
+        """Record the agent position just written, keyed by the file's stat."""
+        st = os.stat(self.pddl_file_path)
+        self._agent_pos_written = (pos, st.st_mtime_ns, st.st_size)
+
     def update_problem_file(self, agent_pos, discovered_objects, output_path=None):
         """
         Updates the problem PDDL with current agent position and discovered objects.
@@ -237,34 +373,63 @@ class PDDLPatcher:
                 content = f.read()
 
             # --- DYNAMIC OBJECT INJECTION ---
-            # Collect all known stores that need to be defined
+            # Collect all known stores that need to be defined, the dynamic
+            # predicates and the obstacle locations in one pass over the objects
             known_stores = set()
             # Always include victory_store
             known_stores.add("victory_store")
+            dynamic_lines = []
+            obstacle_locs = {}  # loc_X_Y -> position, in discovery order
 
-            # Add discovered stores
             for obj_name, metadata in discovered_objects.items():
-                if metadata.get('type') == 'store' or metadata.get('sells_milk'):
+                obj_type = metadata.get('type', 'obstacle')
+                properties = metadata.get('properties', {})
+                # Add discovered stores
+                if obj_type == 'store' or metadata.get('sells_milk'):
                     known_stores.add(obj_name)
 
+                loc = metadata.get('pos')  # Tuple (x, y)
+                if not loc:
+                    continue
+
+                loc_str = f"loc_{loc[0]}_{loc[1]}"
+
+                # --- LOGIC CORE ---
+                if obj_type == 'store' or properties.get('sells_milk'):
+                    # It is a STORE: Make it accessible and selling milk
+                    dynamic_lines.append(f"(at_store {obj_name} {loc_str})")
+                    dynamic_lines.append(f"(selling {obj_name} milk)")  # Note: domain uses 'selling' not 'sells'
+                    # DO NOT ADD BLOCKED FOR STORES - they must be accessible
+                    # Note: Price info is handled in Python logic, not PDDL (Fast Downward doesn't support floats)
+                else:
+                    # It is an OBSTACLE: Block it
+                    dynamic_lines.append(f"(blocked {loc_str})")
+                # ------------------
+
+                # Anything not typed as a store gets its old blocked/clear facts replaced below
+                if obj_type != 'store':
+                    obstacle_locs.setdefault(loc_str, loc)
+
             # Inject into (:objects section
             if "(:objects" in content:
-                # Regex to find the store definition line: e.g. "store1 store2 - store"
-                # We look for "- store" and prepend our new stores
-                match = re.search(r'([a-zA-Z0-9_ ]+)\s-\sstore', content)
-                if match:
-                    existing_stores_str = match.group(1)
+                # Find the store definition line: e.g. "store1 store2 - store"
+                # Anchor on " - store" and walk back to the start of that line
+                store_idx = content.find(" - store")
+                if store_idx != -1:
+                    line_start = content.rfind("\n", 0, store_idx) + 1
+                    existing_stores_str = content[line_start:store_idx]
                     existing_stores = set(existing_stores_str.split())
+                    indent = existing_stores_str[:len(existing_stores_str) - len(existing_stores_str.lstrip())]
 
                     # Merge sets
                     all_stores = existing_stores.union(known_stores)
-                    new_stores_str = " ".join(all_stores)
+                    new_stores_str = " ".join(sorted(all_stores))
 
-                    # Replace in content
-                    content = content.replace(f"{existing_stores_str} - store", f"{new_stores_str} - store")
+                    # Replace in content (keep the line's indentation)
+                    content = content[:line_start] + indent + new_stores_str + content[store_idx:]
                 else:
                     # Fallback: if no stores defined yet, add them after (:objects
-                    stores_def = "\n    " + " ".join(known_stores) + " - store"
+                    stores_def = "\n    " + " ".join(sorted(known_stores)) + " - store"
                     content = content.replace("(:objects", "(:objects" + stores_def)
             # --------------------------------
 
@@ -273,61 +438,33 @@ class PDDLPatcher:
             new_pos_str = f"loc_{agent_pos[0]}_{agent_pos[1]}"
             content = re.sub(r'\(at_agent agent loc_\d+_\d+\)', f'(at_agent agent {new_pos_str})', content)
 
-            # 3. Build Dynamic Predicates
-            dynamic_lines = []
-            
-            for obj_name, metadata in discovered_objects.items():
-                loc = metadata.get('pos')  # Tuple (x, y)
-                if not loc:
-                    continue
-                
-                loc_str = f"loc_{loc[0]}_{loc[1]}"
-                obj_type = metadata.get('type', 'obstacle')
-                properties = metadata.get('properties', {})
-                
-                # --- LOGIC CORE ---
-                if obj_type == 'store' or properties.get('sells_milk'):
-                    # It is a STORE: Make it accessible and selling milk
-                    dynamic_lines.append(f"(at_store {obj_name} {loc_str})")
-                    dynamic_lines.append(f"(selling {obj_name} milk)")  # Note: domain uses 'selling' not 'sells'
-                    # DO NOT ADD BLOCKED FOR STORES - they must be accessible
-                    # Note: Price info is handled in Python logic, not PDDL (Fast Downward doesn't support floats)
-                else:
-                    # It is an OBSTACLE: Block it
-                    dynamic_lines.append(f"(blocked {loc_str})")
-                # ------------------
-
             # 4. Remove old dynamic predicates first (to avoid duplicates)
             # Remove old at_store predicates
             content = re.sub(r'\(at_store \w+ loc_\d+_\d+\)\s*', '', content)
             # Remove old selling predicates
             content = re.sub(r'\(selling \w+ \w+\)\s*', '', content)
-            # Remove old blocked predicates (but keep static walls from update_environment_walls)
-            # We only remove blocked predicates that match our discovered objects
-            for obj_name, metadata in discovered_objects.items():
-                loc = metadata.get('pos')
-                if loc:
-                    loc_str = f"loc_{loc[0]}_{loc[1]}"
-                    blocked_pred = f"(blocked {loc_str})"
-                    # Remove only if it's not a store
-                    if metadata.get('type') != 'store':
-                        content = re.sub(re.escape(blocked_pred) + r'\s*', '', content)
-            
-            # CRITICAL FIX: Remove (clear loc_X_Y) predicates for obstacles
-            # blocked and clear are mutually exclusive - cannot have both!
-            # When we add (blocked loc_X_Y), we must remove (clear loc_X_Y)
-            for obj_name, metadata in discovered_objects.items():
-                loc = metadata.get('pos')
-                if loc:
-                    loc_str = f"loc_{loc[0]}_{loc[1]}"
-                    obj_type = metadata.get('type', 'obstacle')
-                    # If it's an obstacle (not a store), remove the conflicting (clear ...) predicate
-                    if obj_type != 'store':
-                        clear_pred = f"(clear {loc_str})"
-                        clear_pattern = rf'\(clear\s+{re.escape(loc_str)}\)'
-                        if re.search(clear_pattern, content):
-                            content = re.sub(clear_pattern + r'\s*', '', content)
-                            print(f"[PDDL_PATCHER] ✅ Removed conflicting (clear {loc_str}) for obstacle at {loc}")
+            if obstacle_locs:
+                # Remove old blocked predicates (but keep static walls from update_environment_walls)
+                # We only remove blocked predicates that match our discovered objects
+                content = _ALL_BLOCKED_RE.sub(
+                    lambda m: '' if m.group(1) in obstacle_locs else m.group(0), content
+                )
+
+                # CRITICAL FIX: Remove (clear loc_X_Y) predicates for obstacles
+                # blocked and clear are mutually exclusive - cannot have both!
+                # When we add (blocked loc_X_Y), we must remove (clear loc_X_Y)
+                cleared = set()
+
+                def _strip_clear(m):
+                    if m.group(1) in obstacle_locs:
+                        cleared.add(m.group(1))
+                        return ''
+                    return m.group(0)
+
+                content = _ALL_CLEAR_RE.sub(_strip_clear, content)
+                for loc_str, loc in obstacle_locs.items():
+                    if loc_str in cleared:
+                        print(f"[PDDL_PATCHER] ✅ Removed conflicting (clear {loc_str}) for obstacle at {loc}")
 
             # 5. Inject into :init section
             # Find the :init section and its closing parenthesis
@@ -354,6 +491,8 @@ class PDDLPatcher:
                 return False
             
             # Insert dynamic predicates INSIDE :init, before the closing )
+            # Dedupe (a store discovered twice would otherwise be emitted twice)
+            dynamic_lines = list(dict.fromkeys(dynamic_lines))
             if dynamic_lines:
                 new_predicates = "\n        ".join(dynamic_lines)
                 content = content[:init_end] + "\n        " + new_predicates + "\n    " + content[init_end:]
@@ -422,7 +561,7 @@ class PDDLPatcher:
             # USE ROBUST FINDER
             insert_pos = self._find_init_end(content)
             if insert_pos != -1:
-                text = "\n    ".join(blocked_preds + clear_preds)
+                text = "\n    ".join(dict.fromkeys(blocked_preds + clear_preds))
                 content = content[:insert_pos] + "\n    " + text + content[insert_pos:]
 
                 with open(self.pddl_file_path, 'w') as f:
@@ -445,19 +584,17 @@ class PDDLPatcher:
             import re
             content = re.sub(r'\(connected [^\)]+\)\n?', '', content)
 
-            # Generate all grid connections (bidirectional)
-            connected_preds = []
-            for x in range(width):
-                for y in range(height):
-                    # Right neighbor
-                    if x + 1 < width:
-                        connected_preds.append(f"(connected loc_{x}_{y} loc_{x+1}_{y})")
-                        connected_preds.append(f"(connected loc_{x+1}_{y} loc_{x}_{y})")
-
-                    # Down neighbor
-                    if y + 1 < height:
-                        connected_preds.append(f"(connected loc_{x}_{y} loc_{x}_{y+1})")
-                        connected_preds.append(f"(connected loc_{x}_{y+1} loc_{x}_{y})")
+            # Generate all grid connections (bidirectional): one edge per
+            # right/down neighbour pair, each emitted in both directions
+            edges = [(x, y, x + 1, y) for x, y in product(range(width - 1), range(height))]
+            edges += [(x, y, x, y + 1) for x, y in product(range(width), range(height - 1))]
+            connected_pairs = [
+                pair
+                for x1, y1, x2, y2 in edges
+                for pair in ((f"loc_{x1}_{y1}", f"loc_{x2}_{y2}"),
+                             (f"loc_{x2}_{y2}", f"loc_{x1}_{y1}"))
+            ]
+            connected_preds = [f"(connected {a} {b})" for a, b in connected_pairs]
 
             # Add all connected predicates to :init (INSIDE the :init section, before it closes)
             if connected_preds:
@@ -482,6 +619,7 @@ class PDDLPatcher:
 
                     with open(self.pddl_file_path, 'w') as f:
                         f.write(content)
+                    self._connected_set = set(connected_pairs)
 
                     print(f"[PDDL] Added {len(connected_preds)} grid connections to PDDL")
                     return True
@@ -492,6 +630,18 @@ class PDDLPatcher:
 
         return False
 
+    def has_connection(self, from_loc: str, to_loc: str):
+        """
+        Check for (connected from_loc to_loc) without rescanning the file.
+
+        Returns:
+            bool, or None if this patcher has not written the grid connectivity
+            (callers should then look at the file itself)
+        """
+        if self._connected_set is None:
+            return None
+        return (from_loc, to_loc) in self._connected_set
+
     def inject_dynamic_state(self, dynamic_predicates: List[str]) -> bool:
         """
         Safely injects dynamic predicates into the PDDL file while preserving static facts.
@@ -500,11 +650,17 @@ class PDDLPatcher:
         CRITICAL: This method preserves the exact structure of (:init ...) and (:goal ...) sections.
 
         Args:
-            dynamic_predicates (list): List of dynamic predicates to inject
+            dynamic_predicates (list): List of dynamic predicates to inject, as PDDL
+                strings or tuple atoms like ('blocked', 'loc_3_4')
 
         Returns:
             bool: Success status
         """
+        # Serialize tuple atoms to PDDL text at the file-write boundary
+        dynamic_predicates = [
+            pred if isinstance(pred, str) else to_pddl(pred)
+            for pred in dynamic_predicates
+        ]
         try:
             with open(self.pddl_file_path, 'r') as f:
                 content = f.read()
@@ -514,7 +670,7 @@ class PDDLPatcher:
             if init_start == -1:
                 print(f"[PDDL] Could not find :init marker in {self.pddl_file_path}")
                 return False
-            
+
             # Find the LAST closing ) of :init section by tracking nested parentheses
             depth = 0
             init_end = None
@@ -527,7 +683,7 @@ class PDDLPatcher:
                     if depth == 0:
                         init_end = i
                         break
-            
+
             if init_end is None:
                 print(f"[PDDL] Could not find closing ) for :init in {self.pddl_file_path}")
                 return False
@@ -536,31 +692,36 @@ class PDDLPatcher:
             init_content = content[init_start + 6:init_end].strip()  # +6 to skip "(:init"
             
             # 3. Remove old dynamic predicates from the init content only
-            import re
-            # Remove agent position predicates (match multiline patterns)
-            init_content = re.sub(r'\(at_agent agent [^)]+\)\s*', '', init_content)
-            # Remove discovered object predicates, but PRESERVE victory store (it's static)
-            # CRITICAL FIX: Don't remove victory store predicates - they must always exist
-            # First, extract victory store predicates to preserve them
+            # Tokenize the init block once and filter predicates by head instead
+            # of rescanning the whole string with one re.sub per predicate kind
+            init_preds = []
             victory_store_preds = []
-            victory_at_store = re.search(r'\(at_store victory [^)]+\)', init_content)
+            victory_at_store = None
+            victory_selling = None
+            for pred in _split_init_predicates(init_content):
+                # Remove agent position predicates
+                if pred.startswith("(at_agent agent "):
+                    continue
+                # Remove discovered object predicates, but PRESERVE victory store (it's static)
+                # CRITICAL FIX: Don't remove victory store predicates - they must always exist
+                if pred.startswith("(at_store "):
+                    if victory_at_store is None and pred.startswith("(at_store victory "):
+                        victory_at_store = pred
+                    continue
+                if pred.startswith("(selling "):
+                    if victory_selling is None and pred.startswith("(selling victory "):
+                        victory_selling = pred
+                    continue
+                if pred.startswith("(= (item-price "):
+                    continue
+                init_preds.append(pred)
             if victory_at_store:
-                victory_store_preds.append(victory_at_store.group(0))
-            victory_selling = re.search(r'\(selling victory [^)]+\)', init_content)
+                victory_store_preds.append(victory_at_store)
             if victory_selling:
-                victory_store_preds.append(victory_selling.group(0))
-            
-            # Remove all at_store and selling predicates (including victory temporarily)
-            init_content = re.sub(r'\(at_store [^)]+ loc_\d+_\d+\)\s*', '', init_content)
-            init_content = re.sub(r'\(selling [^)]+ [^)]+\)\s*', '', init_content)
-            init_content = re.sub(r'\(= \(item-price [^)]+\) [^)]+\)\s*', '', init_content)
-            
+                victory_store_preds.append(victory_selling)
+
             # Restore victory store predicates (they are static and must always exist)
-            if victory_store_preds:
-                # Add victory predicates back at the beginning of init_content
-                victory_restore = "\n    " + "\n    ".join(victory_store_preds)
-                init_content = victory_restore + "\n" + init_content.lstrip()
-            else:
+            if not victory_store_preds:
                 # If victory store doesn't exist yet, we need to add it
                 # Try to extract victory_loc from the original content before modifications
                 victory_loc_pattern = r'\(at_store\s+victory\s+(loc_\d+_\d+)\)'
@@ -576,17 +737,12 @@ class PDDLPatcher:
                     f"(at_store victory {victory_loc})",
                     "(selling victory milk)"
                 ]
-                victory_restore = "\n    " + "\n    ".join(victory_store_preds)
-                init_content = victory_restore + "\n" + init_content.lstrip()
                 print(f"[PDDL] VICTORY FIX: Added missing victory store predicates: {victory_store_preds}")
+            # Add victory predicates back at the beginning of the init block
+            init_preds[:0] = victory_store_preds
             
             # Keep blocked/clear/connected predicates - they are static infrastructure
 
-            # 4. Clean up extra whitespace/newlines but preserve structure
-            init_content = re.sub(r'\n\s*\n+', '\n    ', init_content)  # Normalize multiple newlines
-            if init_content and not init_content.endswith('\n'):
-                init_content = init_content.rstrip() + '\n    '
-
             # 5. Validate predicates for fractional numbers before injection
             if dynamic_predicates:
                 # CRITICAL: Fast Downward doesn't support fractional numbers
@@ -599,11 +755,11 @@ class PDDLPatcher:
                 
                 if invalid_predicates:
                     error_details = "\n".join([f"  - {pred}: {msg}" for pred, msg in invalid_predicates])
-                    print(f"[PDDL] ERROR: Fractional numbers found in predicates!")
-                    print(f"[PDDL] Fast Downward only supports integers.")
-                    print(f"[PDDL] Invalid predicates:\n{error_details}")
-                    print(f"[PDDL] Suggestion: Use scale_price_to_int() to convert prices to integers.")
-                return False
+                    print(f"[PDDL] ERROR: Fractional numbers found in predicates!\n"
+                          f"[PDDL] Fast Downward only supports integers.\n"
+                          f"[PDDL] Invalid predicates:\n{error_details}\n"
+                          f"[PDDL] Suggestion: Use scale_price_to_int() to convert prices to integers.")
+                    return False
 
                 # ==============================================================================
                 # 🚨 PHYSICAL CONSTRAINT INVARIANT: Only obstacles/walls block their cells
@@ -612,6 +768,7 @@ class PDDLPatcher:
                 obstacle_locations = set()  # Set of loc_X_Y strings for obstacles/walls ONLY
                 store_locations = set()  # Set of loc_X_Y strings for stores (NOT blocked)
                 location_to_obj_name = {}  # Map loc_X_Y -> object name for logging
+                patch_msgs = []  # Collected and printed once after the loops
                 
                 # Extract all locations where objects are discovered and categorize them
                 for pred in dynamic_predicates:
@@ -631,6 +788,10 @@ class PDDLPatcher:
                         if loc not in location_to_obj_name:
                             location_to_obj_name[loc] = "obstacle"
                 
+                # Index existing (clear ...) predicates once instead of a regex per location
+                existing_clears = {m.group(1) for m in map(_ALL_CLEAR_RE.match, init_preds) if m}
+                strip_clears = set()
+
                 # Only enforce blocking for obstacles/walls, NOT for stores
                 # Stores should remain accessible so the planner can target them
                 for loc in obstacle_locations:
@@ -638,8 +799,8 @@ class PDDLPatcher:
                     # (This should not happen if state_manager is used correctly, but defensive programming)
                     if loc in store_locations:
                         store_name = location_to_obj_name.get(loc, "unknown")
-                        print(f"[PDDL_PATCH] ⚠️  CONFLICT DETECTED: Location {loc} is both store ({store_name}) and obstacle!")
-                        print(f"[PDDL_PATCH] ⚠️  PRIORITY: Store takes precedence - skipping blocking (stores must be accessible)")
+                        patch_msgs.append(f"[PDDL_PATCH] ⚠️  CONFLICT DETECTED: Location {loc} is both store ({store_name}) and obstacle!")
+                        patch_msgs.append(f"[PDDL_PATCH] ⚠️  PRIORITY: Store takes precedence - skipping blocking (stores must be accessible)")
                         continue
                     
                     blocked_pred = f"(blocked {loc})"
@@ -648,13 +809,20 @@ class PDDLPatcher:
                     # Step 1: Add blocked predicate to dynamic_predicates if not already there
                     if blocked_pred not in dynamic_predicates:
                         dynamic_predicates.append(blocked_pred)
-                        print(f"[PDDL_PATCH] ✅ Enforced physics for {obj_name} at {loc}: +blocked")
+                        patch_msgs.append(f"[PDDL_PATCH] ✅ Enforced physics for {obj_name} at {loc}: +blocked")
                     
-                    # Step 2: Remove conflicting (clear loc_X_Y) from init_content
-                    clear_pred_pattern = rf'\(clear\s+{re.escape(loc)}\)'
-                    if re.search(clear_pred_pattern, init_content):
-                        init_content = re.sub(clear_pred_pattern + r'\s*', '', init_content)
-                        print(f"[PDDL_PATCH] ✅ Removed conflicting (clear {loc}) predicate")
+                    # Step 2: Mark conflicting (clear loc_X_Y) for removal from the init block
+                    if loc in existing_clears:
+                        strip_clears.add(loc)
+                        patch_msgs.append(f"[PDDL_PATCH] ✅ Removed conflicting (clear {loc}) predicate")
+
+                # Strip all conflicting clears in a single pass
+                if strip_clears:
+                    init_preds = [
+                        pred for pred in init_preds
+                        if not ((m := _ALL_CLEAR_RE.match(pred)) and m.group(1) in strip_clears)
+                    ]
+                    existing_clears -= strip_clears
                 
                 # Ensure stores are NOT blocked and remain clear
                 for loc in store_locations:
@@ -662,46 +830,49 @@ class PDDLPatcher:
                     blocked_pred = f"(blocked {loc})"
                     if blocked_pred in dynamic_predicates:
                         dynamic_predicates.remove(blocked_pred)
-                        print(f"[PDDL_PATCH] ✅ Removed blocking from store at {loc} (stores must be accessible)")
+                        patch_msgs.append(f"[PDDL_PATCH] ✅ Removed blocking from store at {loc} (stores must be accessible)")
                     
                     # Ensure (clear loc_X_Y) exists for stores so planner can target them
                     clear_pred = f"(clear {loc})"
-                    clear_pred_pattern = rf'\(clear\s+{re.escape(loc)}\)'
-                    if not re.search(clear_pred_pattern, init_content):
+                    if loc not in existing_clears:
                         # Add clear predicate for store location
-                        init_content = init_content.rstrip() + f"\n    {clear_pred}"
-                        print(f"[PDDL_PATCH] ✅ Ensured store at {loc} is marked as clear (accessible)")
+                        init_preds.append(clear_pred)
+                        patch_msgs.append(f"[PDDL_PATCH] ✅ Ensured store at {loc} is marked as clear (accessible)")
                 
-                injection = "\n    ".join(dynamic_predicates)
-                if init_content.strip():
-                    init_content = init_content.rstrip() + "\n    " + injection
-                else:
-                    init_content = "    " + injection
+                if patch_msgs:
+                    print("\n".join(patch_msgs))
+
+                init_preds.extend(dynamic_predicates)
 
             # 6. Reconstruct the file with properly formatted (:init ... ) block
-            before_init = content[:init_start]
-            after_init = content[init_end + 1:]  # +1 to skip the closing )
-            
-            new_content = before_init + "(:init\n" + init_content + "  )" + after_init
+            # Assemble all pieces with a single join instead of chained concatenation
+            parts = [content[:init_start], "(:init\n"]
+            if init_preds:
+                parts += ["    ", "\n    ".join(init_preds), "\n"]
+            parts += ["  )", content[init_end + 1:]]  # +1 to skip the closing )
+            new_content = "".join(parts)
 
             # 7. Write the reconstructed file
             with open(self.pddl_file_path, 'w') as f:
                 f.write(new_content)
+            new_init_end = len(new_content) - (len(content) - init_end)
 
             print(f"[PDDL] Successfully injected {len(dynamic_predicates)} dynamic predicates into :init")
             
             # 8. Verify the injection worked and file structure is valid
-            with open(self.pddl_file_path, 'r') as f:
-                final_content = f.read()
-            
+            # (against the content just written - no need to read it back)
+            final_content = new_content
+
             # Check that (:goal still exists and structure is intact
             if '(:goal' not in final_content:
                 print(f"[PDDL] ERROR: (:goal section missing after injection!")
                 return False
             
-            # Verify predicates were added
-            predicates_found = sum(1 for pred in dynamic_predicates if pred in final_content)
-            if predicates_found == len(dynamic_predicates):
+            # Verify predicates were added: one scan of the :init body's atoms, then hash lookups
+            found = set(_split_init_predicates(new_content[init_start + len("(:init"):new_init_end]))
+            missing = [pred for pred in dynamic_predicates if pred not in found]
+            predicates_found = len(dynamic_predicates) - len(missing)
+            if not missing:
                 print(f"[PDDL] Verification: All {len(dynamic_predicates)} predicates found in file")
             else:
                 print(f"[PDDL] WARNING: Only {predicates_found}/{len(dynamic_predicates)} predicates found")
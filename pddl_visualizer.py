@@ -6,7 +6,7 @@ Shows side-by-side comparison of environment state vs PDDL state
 
 import sys
 import os
-import matplotlib.pyplot as plt
+import re
 import numpy as np
 
 # Add project root to path
@@ -17,15 +17,100 @@ from scenarios import get_scenario
 from state_manager import StateManager
 from pddl_patcher import PDDLPatcher
 
+# PDDL_VIZ_FAST=1 writes the side-by-side grids straight to PNG with Pillow,
+# skipping matplotlib import, figure layout and the interactive window
+FAST_MODE = os.environ.get('PDDL_VIZ_FAST') == '1'
+
+_TEMPLATE = """(define (problem temp)
+    (:domain supermarket-navigation)
+    (:objects
+      agent - agent
+      home victory_loc - location
+      victory - store
+      milk - item
+    )
+    (:init
+      (at_agent agent home)
+      (at_store victory victory_loc)
+      (selling victory milk)
+      (connected home victory_loc)
+      (connected victory_loc home)
+      (clear victory_loc)
+    )
+    (:goal (and (have agent milk)))
+    )"""
+
+
+def _write_template(path):
+    """Write the base PDDL template unless the file already matches it"""
+    try:
+        with open(path, "r") as f:
+            if f.read() == _TEMPLATE:
+                return
+    except OSError:
+        pass
+    with open(path, "w") as f:
+        f.write(_TEMPLATE)
+
+
+_LOC_RE = re.compile(r'loc_(\d+)_(\d+)')
+
+
+def _loc(name):
+    """Convert a loc_x_y object name into an (x, y) tuple"""
+    return tuple(map(int, _LOC_RE.match(name).groups()))
+
+
+def _h_at_agent(pddl_data, args):
+    # (at_agent agent loc_x_y)
+    pddl_data['agent_positions'].append(_loc(args[1]))
+
+
+def _h_at_store(pddl_data, args):
+    # (at_store store_name loc_x_y)
+    pddl_data['store_positions'].append({'name': args[0], 'pos': _loc(args[1])})
+
+
+def _h_blocked(pddl_data, args):
+    # (blocked loc_x_y)
+    pddl_data['blocked_locations'].append(_loc(args[0]))
+
+
+def _h_clear(pddl_data, args):
+    # (clear loc_x_y)
+    pddl_data['clear_locations'].append(_loc(args[0]))
+
+
+def _h_connected(pddl_data, args):
+    # (connected loc1 loc2)
+    pddl_data['connections'].append((_loc(args[0]), _loc(args[1])))
+
+
+def _h_selling(pddl_data, args):
+    # (selling store item)
+    pddl_data['selling'].append({'store': args[0], 'item': args[1]})
+
+
+_HANDLERS = {
+    'at_agent': _h_at_agent,
+    'at_store': _h_at_store,
+    'blocked': _h_blocked,
+    'clear': _h_clear,
+    'connected': _h_connected,
+    'selling': _h_selling,
+}
+
+
 class PDDLVisualizer:
     def __init__(self, scenario_id="SCENARIO_4"):
         self.scenario_id = scenario_id
+        self.scenario = get_scenario(scenario_id)
         self.setup_environment()
         self.setup_pddl()
 
     def setup_environment(self):
         """Initialize environment and get current state"""
-        scenario = get_scenario(self.scenario_id)
+        scenario = self.scenario
         self.env = RandomizedMazeEnv(
             width=scenario.get('width', 20),
             height=scenario.get('height', 20),
@@ -43,34 +128,27 @@ class PDDLVisualizer:
             'height': self.env.height
         }
 
+        # Wall coordinates are static for the episode - scan the grid once and
+        # share the result between drawing and the verification report
+        grid = self.env.grid
+        self.world_walls = frozenset(
+            (x, y)
+            for x in range(self.env.width)
+            for y in range(self.env.height)
+            if getattr(grid.get(x, y), 'type', None) == 'wall'
+        )
+        self.wall_coords = np.array(sorted(self.world_walls), dtype=int).reshape(-1, 2)
+
     def setup_pddl(self):
         """Initialize PDDL system and get current state"""
         self.state_manager = StateManager()
         self.patcher = PDDLPatcher("temp_pddl.pddl")
 
-        # Create basic PDDL
-        with open("temp_pddl.pddl", "w") as f:
-            f.write("""(define (problem temp)
-    (:domain supermarket-navigation)
-    (:objects
-      agent - agent
-      home victory_loc - location
-      victory - store
-      milk - item
-    )
-    (:init
-      (at_agent agent home)
-      (at_store victory victory_loc)
-      (selling victory milk)
-      (connected home victory_loc)
-      (connected victory_loc home)
-      (clear victory_loc)
-    )
-    (:goal (and (have agent milk)))
-    )""")
+        # Create basic PDDL (skip the write when the file already holds the template)
+        _write_template("temp_pddl.pddl")
 
         # Add initial stores from scenario
-        scenario = get_scenario(self.scenario_id)
+        scenario = self.scenario
         if scenario and 'surprise_object' in scenario:
             obj = scenario['surprise_object']
             self.state_manager.add_discovery(
@@ -80,8 +158,8 @@ class PDDLVisualizer:
                 price=obj.get('true_price')
             )
 
-        # Get current PDDL predicates
-        self.pddl_state = self.state_manager.get_current_state_predicates()
+        # Get current PDDL predicates (as tuple atoms)
+        self.pddl_state = self.state_manager.get_current_state_atoms()
 
     def parse_pddl_predicates(self):
         """Parse PDDL predicates into structured data"""
@@ -94,65 +172,30 @@ class PDDLVisualizer:
             'selling': []
         }
 
-        for pred in self.pddl_state:
-            pred = pred.strip('()')
-            parts = pred.split()
-
-            if pred.startswith('at_agent'):
-                # (at_agent agent loc_x_y)
-                loc = parts[2].replace('loc_', '').split('_')
-                pddl_data['agent_positions'].append((int(loc[0]), int(loc[1])))
-
-            elif pred.startswith('at_store'):
-                # (at_store store_name loc_x_y)
-                store_name = parts[1]
-                loc = parts[2].replace('loc_', '').split('_')
-                pddl_data['store_positions'].append({
-                    'name': store_name,
-                    'pos': (int(loc[0]), int(loc[1]))
-                })
-
-            elif pred.startswith('blocked'):
-                # (blocked loc_x_y)
-                loc = parts[1].replace('loc_', '').split('_')
-                pddl_data['blocked_locations'].append((int(loc[0]), int(loc[1])))
-
-            elif pred.startswith('clear'):
-                # (clear loc_x_y)
-                loc = parts[1].replace('loc_', '').split('_')
-                pddl_data['clear_locations'].append((int(loc[0]), int(loc[1])))
-
-            elif pred.startswith('connected'):
-                # (connected loc1 loc2)
-                loc1 = parts[1].replace('loc_', '').split('_')
-                loc2 = parts[2].replace('loc_', '').split('_')
-                pddl_data['connections'].append((
-                    (int(loc1[0]), int(loc1[1])),
-                    (int(loc2[0]), int(loc2[1]))
-                ))
-
-            elif pred.startswith('selling'):
-                # (selling store item)
-                pddl_data['selling'].append({
-                    'store': parts[1],
-                    'item': parts[2]
-                })
+        for atom in self.pddl_state:
+            # String facts (e.g. numeric fluents) have no handler and are skipped
+            handler = _HANDLERS.get(atom[0]) if isinstance(atom, tuple) else None
+            if handler:
+                handler(pddl_data, atom[1:])
 
         return pddl_data
 
     def create_visualization(self):
         """Create side-by-side visualization of world vs PDDL"""
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+        if not (FAST_MODE and self._save_fast_png('pddl_translation_verification.png')):
+            import matplotlib.pyplot as plt
 
-        # Left: World State
-        self.draw_world_state(ax1)
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
 
-        # Right: PDDL State
-        self.draw_pddl_state(ax2)
+            # Left: World State
+            self.draw_world_state(ax1)
 
-        plt.tight_layout()
-        plt.savefig('pddl_translation_verification.png', dpi=150, bbox_inches='tight')
-        plt.show()
+            # Right: PDDL State
+            self.draw_pddl_state(ax2)
+
+            plt.tight_layout()
+            plt.savefig('pddl_translation_verification.png', dpi=150, bbox_inches='tight')
+            plt.show()
 
         print("✅ Visualization saved as: pddl_translation_verification.png")
         print("\n" + "="*80)
@@ -161,30 +204,47 @@ class PDDLVisualizer:
 
         self.print_verification_report()
 
-    def draw_world_state(self, ax):
-        """Draw the actual world/environment state"""
+    def _save_fast_png(self, path):
+        """Write world | PDDL grids as one PNG via Pillow; False if Pillow is missing"""
+        try:
+            from PIL import Image
+        except ImportError:
+            print("⚠️  PDDL_VIZ_FAST set but Pillow is not installed - using matplotlib")
+            return False
+
+        side_by_side = np.hstack([self._world_grid(), self._pddl_grid(self.parse_pddl_predicates())])
+        image = Image.fromarray((side_by_side * 255).astype(np.uint8))
+        height, width = side_by_side.shape[:2]
+        scale = max(1, 400 // max(height, 1))
+        image.resize((width * scale, height * scale), Image.NEAREST).save(path)
+        return True
+
+    def _world_grid(self):
+        """RGB grid of the actual world: walls, agent and scenario store"""
         # Create grid representation
-        grid_display = np.zeros((self.world_state['height'], self.world_state['width'], 3))
+        grid_display = np.ones((self.world_state['height'], self.world_state['width'], 3))  # White empty
 
         # Draw walls
-        for x in range(self.world_state['width']):
-            for y in range(self.world_state['height']):
-                cell = self.world_state['grid'].get(x, y)
-                if cell and hasattr(cell, 'type') and cell.type == 'wall':
-                    grid_display[y, x] = [0.5, 0.5, 0.5]  # Gray walls
-                else:
-                    grid_display[y, x] = [1, 1, 1]  # White empty
+        grid_display[self.wall_coords[:, 1], self.wall_coords[:, 0]] = [0.5, 0.5, 0.5]  # Gray walls
 
         # Draw agent
         agent_x, agent_y = self.world_state['agent_pos']
         grid_display[agent_y, agent_x] = [0, 0, 1]  # Blue agent
 
         # Draw stores (from scenario)
-        scenario = get_scenario(self.scenario_id)
+        scenario = self.scenario
         if scenario and 'surprise_object' in scenario:
             store_pos = scenario['surprise_object']['position']
             grid_display[store_pos[1], store_pos[0]] = [1, 0, 0]  # Red store
 
+        return grid_display
+
+    def draw_world_state(self, ax):
+        """Draw the actual world/environment state"""
+        import matplotlib.pyplot as plt
+
+        grid_display = self._world_grid()
+
         ax.imshow(grid_display)
         ax.set_title('🌍 REAL WORLD STATE\n(Blue=Agent, Red=Store, Gray=Walls)', fontsize=12, pad=20)
         ax.set_xlabel('X coordinate')
@@ -200,29 +260,23 @@ class PDDLVisualizer:
         ]
         ax.legend(handles=legend_elements, loc='upper center', bbox_to_anchor=(0.5, -0.05), ncol=4)
 
-    def draw_pddl_state(self, ax):
-        """Draw the PDDL representation of the world"""
+    def _pddl_grid(self, pddl_data):
+        """RGB grid of the PDDL state using the same color coding as the world"""
         # Create empty grid
         grid_display = np.ones((self.world_state['height'], self.world_state['width'], 3))
 
-        # Parse PDDL data
-        pddl_data = self.parse_pddl_predicates()
+        # Draw blocked locations (walls), then agents, then stores on top
+        self._paint(grid_display, pddl_data['blocked_locations'], [0.5, 0.5, 0.5])  # Gray walls
+        self._paint(grid_display, pddl_data['agent_positions'], [0, 0, 1])  # Blue agent
+        self._paint(grid_display, [store['pos'] for store in pddl_data['store_positions']], [1, 0, 0])  # Red store
 
-        # Draw blocked locations (walls)
-        for x, y in pddl_data['blocked_locations']:
-            if 0 <= x < self.world_state['width'] and 0 <= y < self.world_state['height']:
-                grid_display[y, x] = [0.5, 0.5, 0.5]  # Gray walls
+        return grid_display
 
-        # Draw agent positions
-        for x, y in pddl_data['agent_positions']:
-            if 0 <= x < self.world_state['width'] and 0 <= y < self.world_state['height']:
-                grid_display[y, x] = [0, 0, 1]  # Blue agent
-
-        # Draw store positions
-        for store in pddl_data['store_positions']:
-            x, y = store['pos']
-            if 0 <= x < self.world_state['width'] and 0 <= y < self.world_state['height']:
-                grid_display[y, x] = [1, 0, 0]  # Red store
+    def draw_pddl_state(self, ax):
+        """Draw the PDDL representation of the world"""
+        # Parse PDDL data
+        pddl_data = self.parse_pddl_predicates()
+        grid_display = self._pddl_grid(pddl_data)
 
         ax.imshow(grid_display)
         ax.set_title('📋 PDDL STATE REPRESENTATION\n(Same color coding)', fontsize=12, pad=20)
@@ -241,6 +295,15 @@ class PDDLVisualizer:
         ax.text(1.05, 0.5, facts_text, transform=ax.transAxes, fontsize=10,
                 verticalalignment='center', bbox=dict(boxstyle="round,pad=0.3", facecolor="lightgray"))
 
+    @staticmethod
+    def _paint(grid_display, coords, color):
+        """Color all in-bounds (x, y) coords in one vectorized assignment"""
+        arr = np.array(coords, dtype=np.int32).reshape(-1, 2)
+        xs, ys = arr[:, 0], arr[:, 1]
+        height, width = grid_display.shape[:2]
+        mask = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        grid_display[ys[mask], xs[mask]] = color
+
     def print_verification_report(self):
         """Print detailed verification report"""
         pddl_data = self.parse_pddl_predicates()
@@ -261,7 +324,7 @@ class PDDLVisualizer:
         print()
 
         # Store positions check
-        scenario = get_scenario(self.scenario_id)
+        scenario = self.scenario
         world_stores = []
         if scenario and 'surprise_object' in scenario:
             world_stores.append(scenario['surprise_object']['position'])
@@ -277,12 +340,7 @@ class PDDLVisualizer:
         print()
 
         # Wall/blocked check
-        world_walls = []
-        for x in range(self.world_state['width']):
-            for y in range(self.world_state['height']):
-                cell = self.world_state['grid'].get(x, y)
-                if cell and hasattr(cell, 'type') and cell.type == 'wall':
-                    world_walls.append((x, y))
+        world_walls = self.world_walls
 
         pddl_blocked = pddl_data['blocked_locations']
         print(f"🧱 WALLS/BLOCKED:")
@@ -290,7 +348,7 @@ class PDDLVisualizer:
         print(f"   PDDL blocked: {len(pddl_blocked)}")
 
         # Check if PDDL blocked locations are subset of world walls
-        pddl_in_world = set(pddl_blocked).issubset(set(world_walls))
+        pddl_in_world = world_walls.issuperset(pddl_blocked)
         print(f"   All PDDL blocked locations exist in world: {'✅ YES' if pddl_in_world else '❌ NO'}")
         print()
 
@@ -328,7 +386,7 @@ def main():
     visualizer.state_manager.add_discovery("wall_south", (5, 18), obj_type='wall')
 
     # Update PDDL
-    predicates = visualizer.state_manager.get_current_state_predicates()
+    predicates = visualizer.state_manager.get_current_state_atoms()
     visualizer.patcher.inject_dynamic_state(predicates)
 
     print("📊 Creating visualization...")
@@ -1,47 +1,181 @@
 """
 Results Logger for Comparative Experiment Framework
-Logs experimental results to CSV for analysis of different cognitive architectures
+Logs experimental results to CSV for analysis of different cognitive architectures,
+and mirrors them into a SQLite database for aggregate queries.
+
+Export the database back to CSV with:
+    python results_logger.py --export-csv results_export.csv
 """
 
+import argparse
+import atexit
 import csv
+import io
+import math
 import os
+import re
+import sqlite3
 import time
 from typing import Dict, Any
 from datetime import datetime
 
+# Characters that require CSV quoting in a free-text field
+_NEEDS_QUOTING = re.compile(r'[,"\r\n]')
+
+# CSV columns, in file order (also the experiments table's result columns)
+CSV_HEADER = [
+    'timestamp',
+    'scenario_id',
+    'algorithm_mode',
+    'total_steps',
+    'total_cost',
+    'compute_time_seconds',
+    'replans_count',
+    'llm_calls_count',
+    'true_final_price',
+    'victory_reached',
+    'termination_reason'
+]
+
+_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    scenario_id TEXT,
+    algorithm TEXT,
+    steps INTEGER,
+    cost REAL,
+    compute_time REAL,
+    replans INTEGER,
+    llm_calls INTEGER,
+    price REAL,
+    victory INTEGER,
+    termination_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS replans (
+    exp_id INTEGER REFERENCES experiments(id),
+    store TEXT,
+    distance INTEGER,
+    savings REAL,
+    algorithm TEXT
+);
+CREATE INDEX IF NOT EXISTS experiments_algorithm ON experiments(algorithm);
+CREATE INDEX IF NOT EXISTS experiments_scenario ON experiments(scenario_id);
+CREATE INDEX IF NOT EXISTS replans_exp ON replans(exp_id);
+"""
+
+_INSERT_EXPERIMENT = (
+    "INSERT INTO experiments (timestamp, scenario_id, algorithm, steps, cost, compute_time,"
+    " replans, llm_calls, price, victory, termination_reason)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_REPLAN = "INSERT INTO replans (exp_id, store, distance, savings, algorithm) VALUES (?, ?, ?, ?, ?)"
+
+
+def _connect(db_file):
+    """Open a results database, creating its tables if needed."""
+    conn = sqlite3.connect(db_file)
+    conn.executescript(_DB_SCHEMA)
+    return conn
+
+
+def merge_db(src_db, dest_db="results.db"):
+    """
+    Append all experiments (and their replans) from one results database to another.
+
+    Used to collect per-run databases written by parallel sweeps.
+    """
+    if not os.path.exists(src_db):
+        return
+    src = sqlite3.connect(src_db)
+    dest = _connect(dest_db)
+    try:
+        with dest:
+            for row in src.execute("SELECT * FROM experiments ORDER BY id"):
+                exp_id = dest.execute(_INSERT_EXPERIMENT, row[1:]).lastrowid
+                dest.executemany(_INSERT_REPLAN, (
+                    (exp_id, *replan) for replan in src.execute(
+                        "SELECT store, distance, savings, algorithm FROM replans WHERE exp_id = ?", (row[0],))
+                ))
+    finally:
+        src.close()
+        dest.close()
+
+
+def export_csv(db_file, csv_file):
+    """Write a results database's experiments to a CSV file in the logger's CSV layout."""
+    conn = _connect(db_file)
+    try:
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for (timestamp, scenario_id, algorithm, steps, cost, compute_time,
+                 replans, llm_calls, price, victory, reason) in conn.execute(
+                    "SELECT timestamp, scenario_id, algorithm, steps, cost, compute_time,"
+                    " replans, llm_calls, price, victory, termination_reason FROM experiments ORDER BY id"):
+                writer.writerow([
+                    timestamp, scenario_id, algorithm, steps, f"{cost:.2f}", f"{compute_time:.3f}",
+                    replans, llm_calls, f"{price:.2f}" if price is not None else "",
+                    bool(victory), reason
+                ])
+    finally:
+        conn.close()
+
 class ResultsLogger:
     """
     Handles data collection and logging for comparative experiments
+
+    Rows are buffered in memory and written in batches through a single
+    file handle; call flush() (or close()) to make them visible on disk.
+    Each batch is also inserted into the SQLite database (db_file) in one
+    transaction, together with the per-experiment replan events.
     """
 
-    def __init__(self, csv_file="experiment_results.csv"):
+    # Number of buffered rows that triggers a write to the CSV file
+    BATCH_SIZE = 32
+
+    # Preformatted row (same layout and \r\n terminator as csv.writer's default)
+    _FMT = "{},{},{},{},{:.2f},{:.3f},{},{},{},{},{}\r\n"
+
+    def __init__(self, csv_file="experiment_results.csv", db_file="results.db"):
         """
         Initialize the results logger
 
         Args:
             csv_file: Path to CSV file for storing results
+            db_file: Path to SQLite database mirroring the results (None to disable)
         """
         self.csv_file = csv_file
+        self.db_file = db_file
+        self._fh = None
+        self._conn = None
+        self._buf = []
+        self._db_buf = []  # (experiments row, replan rows) pairs not yet inserted
         self._ensure_csv_headers()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def _ensure_csv_headers(self):
         """Ensure CSV file exists with proper headers"""
-        if not os.path.exists(self.csv_file):
-            with open(self.csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp',
-                    'scenario_id',
-                    'algorithm_mode',
-                    'total_steps',
-                    'total_cost',
-                    'compute_time_seconds',
-                    'replans_count',
-                    'llm_calls_count',
-                    'true_final_price',
-                    'victory_reached',
-                    'termination_reason'
-                ])
+        # O_EXCL creates the file only if it's missing - one syscall instead
+        # of a separate exists() check followed by open()
+        try:
+            fd = os.open(self.csv_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
 
     def log_experiment_result(self,
                             scenario_id: str,
@@ -53,9 +187,10 @@ class ResultsLogger:
                             llm_calls_count: int = 0,
                             true_final_price: float = None,
                             victory_reached: bool = False,
-                            termination_reason: str = "completed"):
+                            termination_reason: str = "completed",
+                            replan_events=None):
         """
-        Log a single experiment result to CSV
+        Log a single experiment result to CSV and the results database
 
         Args:
             scenario_id: Scenario identifier (e.g., "SCENARIO_1")
@@ -68,24 +203,76 @@ class ResultsLogger:
             true_final_price: Actual price paid at final destination
             victory_reached: Whether agent reached victory
             termination_reason: Why experiment ended
+            replan_events: Replan event dicts (store, walking_distance, price_savings, algorithm)
         """
         timestamp = datetime.now().isoformat()
 
-        with open(self.csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
+        if self.db_file:
+            self._db_buf.append((
+                (timestamp, scenario_id, algorithm_mode, total_steps, total_cost, compute_time,
+                 replans_count, llm_calls_count, true_final_price, int(bool(victory_reached)),
+                 termination_reason),
+                [(e.get('store'), e.get('walking_distance'), e.get('price_savings'),
+                  e.get('algorithm', algorithm_mode)) for e in replan_events or ()]
+            ))
+
+        if _NEEDS_QUOTING.search(f"{scenario_id}{algorithm_mode}{termination_reason}"):
+            # Rare free-text fields with separators still go through proper CSV quoting
+            row = io.StringIO()
+            csv.writer(row).writerow([
+                timestamp, scenario_id, algorithm_mode, total_steps, f"{total_cost:.2f}",
+                f"{compute_time:.3f}", replans_count, llm_calls_count,
+                f"{true_final_price:.2f}" if true_final_price is not None else "",
+                victory_reached, termination_reason
+            ])
+            self._buf.append(row.getvalue())
+        else:
+            self._buf.append(self._FMT.format(
                 timestamp,
                 scenario_id,
                 algorithm_mode,
                 total_steps,
-                f"{total_cost:.2f}",
-                f"{compute_time:.3f}",
+                total_cost,
+                compute_time,
                 replans_count,
                 llm_calls_count,
                 f"{true_final_price:.2f}" if true_final_price is not None else "",
                 victory_reached,
                 termination_reason
-            ])
+            ))
+        if len(self._buf) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write any buffered rows to the CSV file and the results database"""
+        if self._db_buf:
+            if self._conn is None:
+                self._conn = _connect(self.db_file)
+            with self._conn:
+                for row, replans in self._db_buf:
+                    exp_id = self._conn.execute(_INSERT_EXPERIMENT, row).lastrowid
+                    self._conn.executemany(_INSERT_REPLAN, ((exp_id, *r) for r in replans))
+            self._db_buf.clear()
+        if not self._buf:
+            return
+        if self._fh is None:
+            # Opened lazily so importing the module-level logger doesn't hold a handle;
+            # the working directory may have changed since __init__, so recheck headers
+            self._ensure_csv_headers()
+            self._fh = open(self.csv_file, 'a', newline='', buffering=1 << 16)
+        self._fh.write("".join(self._buf))
+        self._buf.clear()
+        self._fh.flush()
+
+    def close(self):
+        """Flush buffered rows and release the file handle and database connection"""
+        self.flush()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def start_experiment_timer(self) -> float:
         """
@@ -119,42 +306,83 @@ class ResultsLogger:
         Returns:
             Dict with summary statistics
         """
-        results = []
+        self.flush()
         if not os.path.exists(self.csv_file):
             return {"error": "No results file found"}
 
-        with open(self.csv_file, 'r') as f:
-            reader = csv.DictReader(f)
+        # Single pass with running accumulators - no per-row dicts or column lists
+        total_experiments = 0
+        sum_steps = sum_cost = sum_time = sum_replans = 0
+        victories = 0
+        min_steps = min_cost = math.inf
+        max_steps = max_cost = -math.inf
+
+        with open(self.csv_file, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return {"error": "No matching results found"}
+            idx = {name: i for i, name in enumerate(header)}
+            i_scenario = idx['scenario_id']
+            i_algorithm = idx['algorithm_mode']
+            i_steps = idx['total_steps']
+            i_cost = idx['total_cost']
+            i_time = idx['compute_time_seconds']
+            i_replans = idx['replans_count']
+            i_victory = idx['victory_reached']
+
             for row in reader:
-                if scenario_id and row['scenario_id'] != scenario_id:
+                if scenario_id and row[i_scenario] != scenario_id:
                     continue
-                if algorithm_mode and row['algorithm_mode'] != algorithm_mode:
+                if algorithm_mode and row[i_algorithm] != algorithm_mode:
                     continue
-                results.append(row)
+                steps = int(row[i_steps])
+                cost = float(row[i_cost])
+                total_experiments += 1
+                sum_steps += steps
+                sum_cost += cost
+                sum_time += float(row[i_time])
+                sum_replans += int(row[i_replans])
+                if row[i_victory].lower() == 'true':
+                    victories += 1
+                if steps < min_steps:
+                    min_steps = steps
+                if steps > max_steps:
+                    max_steps = steps
+                if cost < min_cost:
+                    min_cost = cost
+                if cost > max_cost:
+                    max_cost = cost
 
-        if not results:
+        if not total_experiments:
             return {"error": "No matching results found"}
 
-        # Calculate statistics
-        total_experiments = len(results)
-        steps_list = [int(r['total_steps']) for r in results]
-        cost_list = [float(r['total_cost']) for r in results]
-        time_list = [float(r['compute_time_seconds']) for r in results]
-        replans_list = [int(r['replans_count']) for r in results]
-        victory_rate = sum(1 for r in results if r['victory_reached'].lower() == 'true') / total_experiments
-
         return {
             "total_experiments": total_experiments,
-            "avg_steps": sum(steps_list) / total_experiments,
-            "avg_cost": sum(cost_list) / total_experiments,
-            "avg_compute_time": sum(time_list) / total_experiments,
-            "avg_replans": sum(replans_list) / total_experiments,
-            "victory_rate": victory_rate,
-            "min_steps": min(steps_list),
-            "max_steps": max(steps_list),
-            "min_cost": min(cost_list),
-            "max_cost": max(cost_list)
+            "avg_steps": sum_steps / total_experiments,
+            "avg_cost": sum_cost / total_experiments,
+            "avg_compute_time": sum_time / total_experiments,
+            "avg_replans": sum_replans / total_experiments,
+            "victory_rate": victories / total_experiments,
+            "min_steps": min_steps,
+            "max_steps": max_steps,
+            "min_cost": min_cost,
+            "max_cost": max_cost
         }
 
-# Global logger instance
+# Global logger instance, kept open for the process lifetime; buffered rows
+# are written at interpreter exit even if no caller flushes
 logger = ResultsLogger()
+atexit.register(logger.close)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Experiment results database tools")
+    parser.add_argument('--db', default="results.db", help="results database (default: results.db)")
+    parser.add_argument('--export-csv', metavar='CSV_FILE', help="export the experiments table to a CSV file")
+    args = parser.parse_args()
+    if args.export_csv:
+        export_csv(args.db, args.export_csv)
+        print(f"Exported {args.db} to {args.export_csv}")
+    else:
+        parser.print_help()
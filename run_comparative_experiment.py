@@ -5,9 +5,16 @@ Runs all 4 algorithms (A, B, C, D) on 4 different mazes (seeds) with SCENARIO_3.
 Each algorithm runs on the same maze (same seed) for fair comparison.
 """
 
+import atexit
+import csv
+import multiprocessing
 import os
-import subprocess
+import shutil
+import signal
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 
 # Configuration
@@ -15,53 +22,157 @@ SEEDS = [1001, 1002, 1003, 1004]  # 4 different mazes
 ALGORITHMS = ['A', 'B', 'C', 'D']
 SCENARIO = 'SCENARIO_3'
 TIMEOUT_SECONDS = 600  # 10 minutes per run
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '0')) or min(len(SEEDS) * len(ALGORITHMS), os.cpu_count() or 1)
 
-def run_single_experiment(seed, algorithm, scenario):
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_CSV = os.path.join(PROJECT_ROOT, 'experiment_results.csv')
+RESULTS_DB = os.path.join(PROJECT_ROOT, 'results.db')
+# run_live_dashboard.py reads/writes these relative to its cwd, so every
+# parallel run gets its own working directory seeded with them
+RUN_DIR_INPUTS = ['domain.pddl', 'problem_initial.pddl', 'problem_backup.pddl', '.env']
+RUN_DIR_LINKS = ['downward']
+
+
+def _prepare_run_dir(seed, algorithm):
+    """Create an isolated working directory for one experiment run."""
+    run_dir = tempfile.mkdtemp(prefix=f"run_{seed}_{algorithm}_")
+    for name in RUN_DIR_INPUTS:
+        src = os.path.join(PROJECT_ROOT, name)
+        if os.path.exists(src):
+            shutil.copy(src, run_dir)
+    for name in RUN_DIR_LINKS:
+        src = os.path.join(PROJECT_ROOT, name)
+        if os.path.exists(src):
+            os.symlink(src, os.path.join(run_dir, name))
+    return run_dir
+
+
+def _merge_results(run_dir):
+    """Append a run's result rows to the shared CSV and database (called from the parent only)."""
+    from results_logger import merge_db
+
+    merge_db(os.path.join(run_dir, 'results.db'), RESULTS_DB)
+    run_csv = os.path.join(run_dir, 'experiment_results.csv')
+    if not os.path.exists(run_csv):
+        return
+    with open(run_csv, 'r', newline='') as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return
+    write_header = not os.path.exists(RESULTS_CSV)
+    with open(RESULTS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(rows[0])
+        writer.writerows(rows[1:])
+
+
+def _init_worker():
+    """
+    Pool initializer: import the dashboard once per worker process.
+
+    Runs from a private directory so the import-time trace.log handler of one
+    worker doesn't rotate another worker's log.
+    """
+    worker_dir = tempfile.mkdtemp(prefix="worker_")
+    os.chdir(worker_dir)
+    # Registered before the import so it runs after the handlers the dashboard
+    # registers (atexit is LIFO): removes the worker's trace.log and results files
+    atexit.register(shutil.rmtree, worker_dir, ignore_errors=True)
+    import run_live_dashboard  # noqa: F401 - matplotlib/LLM client imports paid once here
+
+
+@contextmanager
+def _redirected_output(log_path):
+    """Send fd-level stdout/stderr (including planner subprocesses) to a file."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for f in (fd, *saved):
+            os.close(f)
+
+
+class _RunTimeout(BaseException):
+    """
+    Raised by the SIGALRM handler when a run exceeds its time limit.
+
+    A BaseException so the run's many `except Exception` blocks can't swallow
+    it - the alarm is one-shot, so a swallowed timeout would leave the run
+    without a limit.
+    """
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Raise _RunTimeout in the worker if the run exceeds the time limit."""
+    if not hasattr(signal, 'SIGALRM'):
+        yield  # No alarm signal on this platform - run without a limit
+        return
+
+    def _on_timeout(signum, frame):
+        raise _RunTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _on_timeout)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_single_experiment(seed, algorithm, scenario, timeout=TIMEOUT_SECONDS):
     """
     Run a single experiment with specified seed, algorithm, and scenario.
+
+    Executes inside a pool worker, calling run_live_dashboard.run() in-process
+    from an isolated working directory.
     
     Args:
         seed: Seed value for maze generation
         algorithm: Algorithm mode (A/B/C/D)
         scenario: Scenario ID (e.g., 'SCENARIO_3')
+        timeout: Wall-clock limit for the run in seconds
     
     Returns:
-        bool: True if successful, False otherwise
+        tuple: (success, run_dir) - run_dir holds run.log and the run's results CSV
     """
-    print(f"\n{'='*70}")
-    print(f"🎲 SEED: {seed} | 🤖 ALGORITHM: {algorithm} | 📋 SCENARIO: {scenario}")
-    print(f"{'='*70}")
-    
-    # Prepare environment variables
-    env = os.environ.copy()
-    env['USE_FIXED_SEED'] = 'true'  # Use fixed seed for reproducibility
-    env['SEED'] = str(seed)
-    env['ALGORITHM_MODE'] = algorithm
-    env['SCENARIO_ID'] = scenario
+    from run_live_dashboard import run
+
+    run_dir = _prepare_run_dir(seed, algorithm)
+    log_path = os.path.join(run_dir, 'run.log')
+    print(f"🎲 SEED: {seed} | 🤖 ALGORITHM: {algorithm} | 📋 SCENARIO: {scenario} | 📄 {log_path}")
     
     try:
-        # Run the experiment with timeout
-        result = subprocess.run(
-            [sys.executable, 'run_live_dashboard.py'],
-            env=env,
-            timeout=TIMEOUT_SECONDS,
-            capture_output=False,  # Show output in real-time
-            text=True
-        )
+        # Output goes to the run's log file since parallel runs would
+        # otherwise interleave on the console
+        os.chdir(run_dir)
+        with _redirected_output(log_path), _time_limit(timeout):
+            returncode = run(seed, algorithm, scenario)
         
-        if result.returncode == 0:
+        if returncode == 0:
             print(f"✅ SUCCESS: Seed {seed}, Algorithm {algorithm}")
-            return True
+            return True, run_dir
         else:
-            print(f"❌ FAILED: Seed {seed}, Algorithm {algorithm} (exit code: {result.returncode})")
-            return False
+            print(f"❌ FAILED: Seed {seed}, Algorithm {algorithm} (exit code: {returncode})")
+            return False, run_dir
             
-    except subprocess.TimeoutExpired:
-        print(f"⏱️ TIMEOUT: Seed {seed}, Algorithm {algorithm} (exceeded {TIMEOUT_SECONDS}s)")
-        return False
+    except _RunTimeout:
+        print(f"⏱️ TIMEOUT: Seed {seed}, Algorithm {algorithm} (exceeded {timeout}s)")
+        return False, run_dir
     except Exception as e:
         print(f"❌ ERROR: Seed {seed}, Algorithm {algorithm} - {str(e)}")
-        return False
+        return False, run_dir
 
 def main():
     """Main experiment runner"""
@@ -75,26 +186,36 @@ def main():
     print("="*70)
     
     start_time = datetime.now()
-    results = {}
     
-    # Run experiments: for each seed, run all algorithms
+    # Run experiments: every (seed, algorithm) pair is independent, so run
+    # them in parallel, each in its own working directory
+    print(f"⚙️  Workers: {MAX_WORKERS}")
+    # Inherited by the spawned workers
+    os.environ['OMP_NUM_THREADS'] = '1'  # Avoid oversubscription with parallel runs
+    os.environ.setdefault('MPLBACKEND', 'Agg')  # No interactive windows from parallel runs
+    results = {seed: {} for seed in SEEDS}
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(run_single_experiment, seed, algorithm, SCENARIO): (seed, algorithm)
+            for seed in SEEDS
+            for algorithm in ALGORITHMS
+        }
+        for future in as_completed(futures):
+            seed, algorithm = futures[future]
+            try:
+                success, run_dir = future.result()
+                _merge_results(run_dir)
+            except Exception as e:
+                print(f"❌ ERROR: Seed {seed}, Algorithm {algorithm} - {str(e)}")
+                success = False
+            results[seed][algorithm] = success
+    
     for seed in SEEDS:
-        print(f"\n{'#'*70}")
-        print(f"# 🎲 MAZE {seed} - Running all algorithms on the same maze")
-        print(f"{'#'*70}")
-        
-        seed_results = {}
-        for algorithm in ALGORITHMS:
-            success = run_single_experiment(seed, algorithm, SCENARIO)
-            seed_results[algorithm] = success
-            
-            # Brief pause between runs
-            import time
-            time.sleep(1)
-        
+        # Summary for this seed (in the configured algorithm order)
+        seed_results = {algo: results[seed].get(algo, False) for algo in ALGORITHMS}
         results[seed] = seed_results
-        
-        # Summary for this seed
         print(f"\n📊 Results for SEED {seed}:")
         for algo, success in seed_results.items():
             status = "✅" if success else "❌"
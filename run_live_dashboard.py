@@ -3,10 +3,20 @@ Live Dashboard for LLM-Driven Dynamic Replanning Research
 50x50 Maze Configuration with Full Logging and Walking Distance Analysis
 """
 
+import functools
+import inspect
+import logging
 import os
-import time
 import re
+import subprocess
+import sys
+import time
+import traceback
+from collections import deque
+from itertools import islice
+import gymnasium as gym
 import matplotlib.pyplot as plt
+import numpy as np
 from dotenv import load_dotenv
 
 # Load environment variables from .env file immediately
@@ -16,198 +26,301 @@ from results_logger import logger as results_logger
 from scenarios import SCENARIOS, get_scenario
 from utils.logger import setup_logger
 from state_manager import StateManager
-from pddl_patcher import PDDLPatcher
+from pddl_patcher import PDDLPatcher, grid_locations_str
 from llm_reasoner import LLMReasoner
-from simulation_engine import FastDownwardRunner, StateTranslator, detect_new_entities
+from simulation_engine import FastDownwardRunner, StateTranslator, detect_new_entities, entity_key
 from custom_env import RandomizedMazeEnv
 
 logger = setup_logger()
 
+# Patterns used by the PDDL diagnostics below, compiled once
+# Goal text | (at_agent agent loc) | (at agent loc) | victory store loc, in one pass
+_META_RE = re.compile(
+    r'\(:goal\s+(?P<goal>.*?)\s*\)(?=\s*\))'
+    r'|\(at_agent\s+agent\s+(?P<agent>loc_\d+_\d+)\)'
+    r'|\(at\s+agent\s+(?P<agent2>loc_\d+_\d+)\)'
+    r'|\(at_store\s+victory\s+(?P<victory>loc_\d+_\d+)\)',
+    re.DOTALL
+)
+# Static parts of the freshly generated problem file (see run_live_dashboard)
+_PROBLEM_HEAD = """(define (problem supermarket-navigation-problem)
+    (:domain supermarket-navigation)
+    (:objects
+      agent - agent
+      """
+_PROBLEM_OBJECTS_TAIL = """ - location
+      victory - store
+      milk - item
+    )
+    (:init
+"""
+_PROBLEM_TAIL = """    )
+    (:goal (and (have agent milk)))
+    )"""
+
+_CONNECTED_RE = re.compile(rb'\(connected\s+')
+_SELLING_VICTORY = b"(selling victory milk)"
+_LOC_RE = re.compile(r'\bloc_(\d+)_(\d+)\b')
+# Action name and its first two arguments, e.g. '(drive loc_1_1 loc_1_2)'
+_PDDL_RE = re.compile(r'\(?\s*([^\s()]+)\s+([^\s()]+)\s+([^\s()]+)')
+
+
+def _build_wall_mask(env):
+    """Boolean (width, height) wall mask of the env grid, built once and cached on env."""
+    mask = getattr(env, '_wall_mask', None)
+    if mask is None or mask.shape != (env.width, env.height):
+        mask = np.fromiter(
+            (getattr(env.grid.get(x, y), 'type', None) == 'wall'
+             for x in range(env.width) for y in range(env.height)),
+            dtype=bool, count=env.width * env.height
+        ).reshape(env.width, env.height)
+        env._wall_mask = mask
+    return mask
+
 
 def diagnose_pddl_positions(scenario, env):
     """Check if start/goal are valid and not blocked"""
-    print("\n" + "="*60)
-    print("PDDL POSITION DIAGNOSTIC")
-    print("="*60)
-    
-    start_pos = scenario['start_pos']
-    victory_pos = scenario['victory_pos']
-    
-    print(f"Start Position: {start_pos}")
-    print(f"Goal Position: {victory_pos}")
-    
-    # Check if positions are within grid
-    if not (0 <= start_pos[0] < env.width and 0 <= start_pos[1] < env.height):
-        print(f"❌ ERROR: Start position {start_pos} is OUTSIDE grid!")
-        return False
+    out = []  # Emitted with a single print() when the diagnostic finishes
+    try:
+        out.append("\n" + "="*60)
+        out.append("PDDL POSITION DIAGNOSTIC")
+        out.append("="*60)
     
-    if not (0 <= victory_pos[0] < env.width and 0 <= victory_pos[1] < env.height):
-        print(f"❌ ERROR: Goal position {victory_pos} is OUTSIDE grid!")
-        return False
+        start_pos = scenario['start_pos']
+        victory_pos = scenario['victory_pos']
     
-    # Check if positions are blocked by walls
-    start_cell = env.grid.get(*start_pos)
-    goal_cell = env.grid.get(*victory_pos)
+        out.append(f"Start Position: {start_pos}")
+        out.append(f"Goal Position: {victory_pos}")
     
-    print(f"Start cell type: {getattr(start_cell, 'type', 'empty') if start_cell else 'empty'}")
-    print(f"Goal cell type: {getattr(goal_cell, 'type', 'empty') if goal_cell else 'empty'}")
+        # Evaluate bounds and wall checks for both positions up front (rows are
+        # start, goal); out-of-bounds rows are clipped for the mask lookup and
+        # can never count as walls
+        coords = np.array([start_pos, victory_pos])
+        in_bounds = ((coords >= 0) & (coords < (env.width, env.height))).all(axis=1)
+        safe = np.clip(coords, 0, (env.width - 1, env.height - 1))
+        is_wall = _build_wall_mask(env)[safe[:, 0], safe[:, 1]] & in_bounds
+        checks = (
+            (in_bounds[0], f"❌ ERROR: Start position {start_pos} is OUTSIDE grid!"),
+            (in_bounds[1], f"❌ ERROR: Goal position {victory_pos} is OUTSIDE grid!"),
+            (not is_wall[0], "❌ ERROR: Start position is a WALL!"),
+            (not is_wall[1], "❌ ERROR: Goal position is a WALL!"),
+        )
     
-    if start_cell and hasattr(start_cell, 'type') and start_cell.type == 'wall':
-        print("❌ ERROR: Start position is a WALL!")
-        return False
+        # Cell types (grid.get only accepts in-bounds coordinates)
+        if in_bounds.all():
+            start_cell = env.grid.get(*start_pos)
+            goal_cell = env.grid.get(*victory_pos)
+            out.append(f"Start cell type: {getattr(start_cell, 'type', 'empty') if start_cell else 'empty'}")
+            out.append(f"Goal cell type: {getattr(goal_cell, 'type', 'empty') if goal_cell else 'empty'}")
     
-    if goal_cell and hasattr(goal_cell, 'type') and goal_cell.type == 'wall':
-        print("❌ ERROR: Goal position is a WALL!")
-        return False
+        errors = [msg for ok, msg in checks if not ok]
+        if errors:
+            out.extend(errors)
+            return False
     
-    # Check Manhattan distance
-    manhattan = abs(victory_pos[0] - start_pos[0]) + abs(victory_pos[1] - start_pos[1])
-    print(f"Manhattan distance: {manhattan}")
+        # Check Manhattan distance
+        manhattan = abs(victory_pos[0] - start_pos[0]) + abs(victory_pos[1] - start_pos[1])
+        out.append(f"Manhattan distance: {manhattan}")
     
-    print("✅ Positions look valid")
-    print("="*60 + "\n")
-    return True
+        out.append("✅ Positions look valid")
+        out.append("="*60 + "\n")
+        return True
+    finally:
+        print("\n".join(out))
 
 
-def diagnose_pddl_file():
-    """Check if problem.pddl is well-formed"""
-    print("\n" + "="*60)
-    print("PDDL FILE DIAGNOSTIC")
-    print("="*60)
-    
+def _paren_counts(text):
+    """
+    (number of '(', number of ')') in text from one vectorized pass.
+
+    UTF-8 never uses 0x28/0x29 inside multi-byte sequences, so byte counts
+    equal character counts.
+    """
+    counts = np.bincount(np.frombuffer(text.encode(), dtype=np.uint8), minlength=0x2A)
+    return int(counts[0x28]), int(counts[0x29])
+
+
+def validate_and_fix(pddl_text):
+    """
+    Return pddl_text with a missing :goal restored and missing closing
+    parentheses appended (unchanged if it is already valid).
+    """
+    if "(:goal" not in pddl_text:
+        logger.error("PDDL", "❌ CRITICAL: :goal section missing from PDDL! Adding it back...")
+        # Find the last ) and add :goal before it
+        last_paren = pddl_text.rfind(")")
+        if last_paren != -1:
+            pddl_text = pddl_text[:last_paren] + "\n    (:goal (and (have agent milk)))\n" + pddl_text[last_paren:]
+            logger.info("PDDL", "✅ :goal section restored")
+
+    # Final parentheses check
+    open_count, close_count = _paren_counts(pddl_text)
+    if open_count != close_count:
+        logger.error("PDDL", f"❌ CRITICAL: Parentheses imbalance! Open: {open_count}, Close: {close_count}")
+        # Emergency fix: add missing closing parens
+        diff = open_count - close_count
+        if diff > 0:
+            pddl_text += '\n' + ')' * diff
+            logger.info("PDDL", f"✅ Added {diff} missing closing parentheses")
+
+    return pddl_text
+
+
+def _load_pddl_bytes(path="problem_initial.pddl"):
+    """Read a PDDL problem file as raw bytes (shared by the diagnostics below)."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def diagnose_pddl_file(content=None):
+    """Check if problem.pddl is well-formed (content: preloaded file bytes, read if None)"""
+    out = []  # Emitted with a single print() when the diagnostic finishes
     try:
-        with open("problem_initial.pddl", "r") as f:
-            content = f.read()
+        out.append("\n" + "="*60)
+        out.append("PDDL FILE DIAGNOSTIC")
+        out.append("="*60)
+    
+        try:
+            if content is None:
+                content = _load_pddl_bytes()
+            content = content.decode()
         
-        # Check for key components
-        has_init = "(:init" in content
-        has_goal = "(:goal" in content
-        has_agent = "at_agent" in content or "(at agent" in content
-        has_victory = "at_store victory" in content or "victory" in content
-        has_milk = "milk" in content
+            # Check for key components
+            has_init = "(:init" in content
+            has_goal = "(:goal" in content
+            has_agent = "at_agent" in content or "(at agent" in content
+            has_victory = "at_store victory" in content or "victory" in content
+            has_milk = "milk" in content
         
-        print(f"Has :init section: {has_init}")
-        print(f"Has :goal section: {has_goal}")
-        print(f"Has agent location: {has_agent}")
-        print(f"Has victory store: {has_victory}")
-        print(f"Has milk item: {has_milk}")
+            out.append(f"Has :init section: {has_init}")
+            out.append(f"Has :goal section: {has_goal}")
+            out.append(f"Has agent location: {has_agent}")
+            out.append(f"Has victory store: {has_victory}")
+            out.append(f"Has milk item: {has_milk}")
         
-        # Extract goal
-        import re
-        goal_match = re.search(r'\(:goal\s+(.*?)\s*\)(?=\s*\))', content, re.DOTALL)
-        if goal_match:
-            goal_text = goal_match.group(1)
-            print(f"\nGoal definition:\n{goal_text}")
+            # Extract goal, agent and victory store locations in a single scan
+            # (first match of each wins; "at_agent" takes precedence over "at")
+            found = {}
+            for m in _META_RE.finditer(content):
+                found.setdefault(m.lastgroup, m.group(m.lastgroup))
+                if 'goal' in found and 'agent' in found and 'victory' in found:
+                    break
         
-        # Extract agent location
-        agent_match = re.search(r'\(at_agent\s+agent\s+(loc_\d+_\d+)\)', content)
-        if agent_match:
-            agent_loc = agent_match.group(1)
-            print(f"\nAgent location: {agent_loc}")
-        else:
-            agent_match2 = re.search(r'\(at\s+agent\s+(loc_\d+_\d+)\)', content)
-            if agent_match2:
-                agent_loc = agent_match2.group(1)
-                print(f"\nAgent location: {agent_loc}")
+            if 'goal' in found:
+                goal_text = found['goal']
+                out.append(f"\nGoal definition:\n{goal_text}")
+        
+            agent_loc = found.get('agent') or found.get('agent2')
+            if agent_loc:
+                out.append(f"\nAgent location: {agent_loc}")
             else:
-                print("\n❌ ERROR: No agent location found!")
+                out.append("\n❌ ERROR: No agent location found!")
         
-        # Extract victory store location
-        victory_match = re.search(r'\(at_store\s+victory\s+(loc_\d+_\d+)\)', content)
-        if victory_match:
-            victory_loc = victory_match.group(1)
-            print(f"Victory store location: {victory_loc}")
-        else:
-            print("❌ ERROR: No victory store location found!")
+            victory_loc = found.get('victory')
+            if victory_loc:
+                out.append(f"Victory store location: {victory_loc}")
+            else:
+                out.append("❌ ERROR: No victory store location found!")
         
-        # Check for obvious issues
-        if "(and )" in content:
-            print("\n⚠️ WARNING: Empty 'and' clause found!")
+            # Check for obvious issues
+            if "(and )" in content:
+                out.append("\n⚠️ WARNING: Empty 'and' clause found!")
         
-        if content.count("(:init") > 1:
-            print("\n❌ ERROR: Multiple :init sections!")
+            if content.count("(:init") > 1:
+                out.append("\n❌ ERROR: Multiple :init sections!")
         
-        if content.count("(:goal") > 1:
-            print("\n❌ ERROR: Multiple :goal sections!")
+            if content.count("(:goal") > 1:
+                out.append("\n❌ ERROR: Multiple :goal sections!")
         
-        print("\n" + "="*60 + "\n")
+            out.append("\n" + "="*60 + "\n")
         
-    except FileNotFoundError:
-        print("❌ ERROR: problem_initial.pddl not found!")
-        print("="*60 + "\n")
-        return False
+        except FileNotFoundError:
+            out.append("❌ ERROR: problem_initial.pddl not found!")
+            out.append("="*60 + "\n")
+            return False
     
-    return True
+        return True
+    finally:
+        print("\n".join(out))
 
 
-def diagnose_connectivity(start_pos, goal_pos):
-    """Check if there's a path in PDDL"""
-    print("\n" + "="*60)
-    print("CONNECTIVITY DIAGNOSTIC")
-    print("="*60)
-    
+def diagnose_connectivity(start_pos, goal_pos, content=None):
+    """Check if there's a path in PDDL (content: preloaded file bytes, read if None)"""
+    out = []  # Emitted with a single print() when the diagnostic finishes
     try:
-        with open("problem_initial.pddl", "r") as f:
-            content = f.read()
+        out.append("\n" + "="*60)
+        out.append("CONNECTIVITY DIAGNOSTIC")
+        out.append("="*60)
+    
+        try:
+            if content is None:
+                content = _load_pddl_bytes()
         
-        start_loc = f"loc_{start_pos[0]}_{start_pos[1]}"
-        goal_loc = f"loc_{goal_pos[0]}_{goal_pos[1]}"
+            start_loc = f"loc_{start_pos[0]}_{start_pos[1]}"
+            goal_loc = f"loc_{goal_pos[0]}_{goal_pos[1]}"
+            # Byte forms for the literal searches below, encoded once
+            start_key = start_loc.encode()
+            goal_key = goal_loc.encode()
         
-        print(f"Checking path from {start_loc} to {goal_loc}...")
+            out.append(f"Checking path from {start_loc} to {goal_loc}...")
         
-        # Check if locations exist
-        if start_loc not in content:
-            print(f"❌ ERROR: Start location {start_loc} not in PDDL!")
-            return False
+            # Check if locations exist
+            if start_key not in content:
+                out.append(f"❌ ERROR: Start location {start_loc} not in PDDL!")
+                return False
         
-        if goal_loc not in content:
-            print(f"❌ ERROR: Goal location {goal_loc} not in PDDL!")
-            return False
+            if goal_key not in content:
+                out.append(f"❌ ERROR: Goal location {goal_loc} not in PDDL!")
+                return False
         
-        # Count connected predicates
-        import re
-        connected_count = len(re.findall(r'\(connected\s+', content))
-        print(f"Total (connected ...) predicates: {connected_count}")
+            # Count connected predicates (the patcher writes them single-spaced,
+            # so fixed substrings can be counted without the regex engine)
+            connected_count = content.count(b"(connected ")
+            out.append(f"Total (connected ...) predicates: {connected_count}")
         
-        if connected_count == 0:
-            print("❌ ERROR: NO connectivity defined!")
-            return False
+            if connected_count == 0:
+                out.append("❌ ERROR: NO connectivity defined!")
+                return False
         
-        # Check if start has any connections
-        start_connections = len(re.findall(rf'\(connected\s+{start_loc}\s+', content))
-        print(f"Connections FROM start: {start_connections}")
+            # Check if start has any connections
+            start_connections = content.count(b"(connected " + start_key + b" ")
+            out.append(f"Connections FROM start: {start_connections}")
         
-        if start_connections == 0:
-            print(f"❌ ERROR: Start location {start_loc} has NO outgoing connections!")
-            return False
+            if start_connections == 0:
+                out.append(f"❌ ERROR: Start location {start_loc} has NO outgoing connections!")
+                return False
         
-        # Check if goal has any connections
-        goal_connections = len(re.findall(rf'\(connected\s+\w+\s+{goal_loc}\)', content))
-        print(f"Connections TO goal: {goal_connections}")
+            # Check if goal has any connections
+            goal_re = re.compile(_CONNECTED_RE.pattern + rb'\w+\s+' + re.escape(goal_key) + rb'\)')
+            goal_connections = len(goal_re.findall(content))
+            out.append(f"Connections TO goal: {goal_connections}")
         
-        if goal_connections == 0:
-            print(f"❌ ERROR: Goal location {goal_loc} has NO incoming connections!")
-            return False
+            if goal_connections == 0:
+                out.append(f"❌ ERROR: Goal location {goal_loc} has NO incoming connections!")
+                return False
         
-        print("✅ Basic connectivity exists")
-        print("="*60 + "\n")
+            out.append("✅ Basic connectivity exists")
+            out.append("="*60 + "\n")
         
-    except Exception as e:
-        print(f"❌ ERROR: {e}")
-        print("="*60 + "\n")
-        return False
+        except Exception as e:
+            out.append(f"❌ ERROR: {e}")
+            out.append("="*60 + "\n")
+            return False
     
-    return True
+        return True
+    finally:
+        print("\n".join(out))
+
+
+def _decode_tail(data, limit):
+    """Decode the last `limit` bytes of captured output, noting how much was cut."""
+    if len(data) <= limit:
+        return data.decode('utf-8', 'replace')
+    return f"... ({len(data) - limit} bytes omitted)\n" + data[-limit:].decode('utf-8', 'replace')
 
 
 def run_verbose_planner():
     """Run Fast Downward with more output to see what's wrong"""
-    print("\n" + "="*60)
-    print("RUNNING PLANNER IN VERBOSE MODE")
-    print("="*60)
-    
-    import subprocess
-    
     cmd = [
         "./downward/fast-downward.py",
         "domain.pddl",
@@ -216,35 +329,45 @@ def run_verbose_planner():
         "astar(lmcut())"
     ]
     
-    print(f"Command: {' '.join(cmd)}")
-    print()
+    # Header goes out before the (up to 30s) planner run, the results in one write after
+    print("\n".join([
+        "\n" + "="*60,
+        "RUNNING PLANNER IN VERBOSE MODE",
+        "="*60,
+        f"Command: {' '.join(cmd)}",
+        "",
+    ]))
     
+    out = []
     try:
         result = subprocess.run(
             cmd,
             capture_output=True,
-            text=True,
+            close_fds=False,  # posix_spawn, as in FastDownwardRunner.run_planner
             timeout=30
         )
         
-        print("STDOUT:")
-        print(result.stdout)
-        print("\nSTDERR:")
-        print(result.stderr)
-        print(f"\nExit code: {result.returncode}")
+        # Output stays bytes: only the tail that gets printed is decoded
+        out.append("STDOUT:")
+        out.append(_decode_tail(result.stdout, 8192))
+        out.append("\nSTDERR:")
+        out.append(_decode_tail(result.stderr, 4096))
+        out.append(f"\nExit code: {result.returncode}")
         
         if result.returncode == 12:
-            print("\n❌ Exit code 12 = UNSOLVABLE")
-            print("Reasons:")
-            print("  - Goal is unreachable from start")
-            print("  - PDDL has logical contradiction")
-            print("  - Missing required predicates")
+            out.append("\n❌ Exit code 12 = UNSOLVABLE")
+            out.append("Reasons:")
+            out.append("  - Goal is unreachable from start")
+            out.append("  - PDDL has logical contradiction")
+            out.append("  - Missing required predicates")
         
-        print("="*60 + "\n")
+        out.append("="*60 + "\n")
         
     except Exception as e:
-        print(f"❌ ERROR: {e}")
-        print("="*60 + "\n")
+        out.append(f"❌ ERROR: {e}")
+        out.append("="*60 + "\n")
+    
+    print("\n".join(out))
 
 
 def diagnose_exit_code_12(scenario, env):
@@ -257,10 +380,14 @@ def diagnose_exit_code_12(scenario, env):
     print("FAST DOWNWARD EXIT CODE 12 - DIAGNOSTIC MODE")
     print("🔴"*30 + "\n")
     
-    # Run diagnostics
+    # Run diagnostics (the problem file is read once and shared)
+    try:
+        content = _load_pddl_bytes()
+    except OSError:
+        content = None  # Let each diagnostic report the missing file itself
     pos_ok = diagnose_pddl_positions(scenario, env)
-    pddl_ok = diagnose_pddl_file()
-    conn_ok = diagnose_connectivity(scenario['start_pos'], scenario['victory_pos'])
+    pddl_ok = diagnose_pddl_file(content)
+    conn_ok = diagnose_connectivity(scenario['start_pos'], scenario['victory_pos'], content)
     
     # Run verbose planner
     run_verbose_planner()
@@ -281,7 +408,7 @@ def diagnose_exit_code_12(scenario, env):
         print("❌ Found issues - fix these first!")
 
 
-def ensure_victory_store(pddl_path="problem_initial.pddl", victory_pos=(18, 18)):
+def ensure_victory_store(pddl_path="problem_initial.pddl", victory_pos=(18, 18), content=None):
     """
     CRITICAL FIX: Ensures Victory Store is injected into PDDL file.
     This prevents Exit Code 12 (Unsolvable) when the goal requires buying milk.
@@ -289,43 +416,47 @@ def ensure_victory_store(pddl_path="problem_initial.pddl", victory_pos=(18, 18))
     Args:
         pddl_path: Path to the PDDL problem file
         victory_pos: Tuple (x, y) position of the victory store
+        content: Preloaded file bytes (read from pddl_path if None)
+    
+    Returns:
+        bytes: The file content after the check (reflects any injection),
+        or None if the file could not be processed
     """
     try:
-        with open(pddl_path, 'r') as f:
-            content = f.read()
+        # Work on raw bytes: presence checks and the splice are plain find()s
+        if content is None:
+            content = _load_pddl_bytes(pddl_path)
         
         # Check if victory store predicates are missing
         victory_loc = f"loc_{victory_pos[0]}_{victory_pos[1]}"
-        has_at_store = f"(at_store victory {victory_loc})" in content
-        has_selling = "(selling victory milk)" in content
+        at_store_key = b"(at_store victory " + victory_loc.encode() + b")"
+        has_at_store = at_store_key in content
+        has_selling = _SELLING_VICTORY in content
         
         if not has_at_store or not has_selling:
             logger.warning("VICTORY_FIX", f"🔧 Missing Victory Store predicates - injecting...")
             logger.warning("VICTORY_FIX", f"   Victory location: {victory_loc}")
             
             # Find the (:init section
-            if "(:init" in content:
+            if b"(:init" in content:
                 # Prepare the predicates (using correct domain format)
-                victory_predicates = f"""
-        (at_store victory {victory_loc})
-        (selling victory milk)
-"""
+                victory_predicates = b"".join([
+                    b"\n        ", at_store_key, b"\n        ", _SELLING_VICTORY, b"\n"
+                ])
                 
-                # Try to insert after (:init but before the closing parenthesis
-                # Look for the pattern (:init\n and insert after it
-                init_pattern = r'\(:init\s*\n'
-                if re.search(init_pattern, content):
-                    # Insert after (:init
-                    new_content = re.sub(
-                        init_pattern,
-                        r'(:init' + victory_predicates + '\n',
-                        content,
-                        count=1
-                    )
+                # Insert right after "(:init" + trailing whitespace up to its last newline
+                # (same splice point as matching r'\(:init\s*\n')
+                insert_at = _find_init_line_end(content)
+                if insert_at != -1:
+                    new_content = b"".join([
+                        content[:insert_at[0]], b"(:init", victory_predicates, b"\n",
+                        content[insert_at[1]:]
+                    ])
                     
                     # Write the updated content
-                    with open(pddl_path, 'w') as f:
+                    with open(pddl_path, 'wb') as f:
                         f.write(new_content)
+                    content = new_content
                     
                     logger.info("VICTORY_FIX", "✅ Victory store predicates injected successfully")
                     logger.debug("VICTORY_FIX", f"   Added: (at_store victory {victory_loc})")
@@ -336,11 +467,33 @@ def ensure_victory_store(pddl_path="problem_initial.pddl", victory_pos=(18, 18))
                 logger.error("VICTORY_FIX", "❌ Could not find (:init block in PDDL")
         else:
             logger.debug("VICTORY_FIX", f"✅ Victory store already exists in PDDL")
+        
+        return content
             
     except Exception as e:
         logger.error("VICTORY_FIX", f"❌ Error ensuring victory store: {e}")
-        import traceback
         traceback.print_exc()
+        return None
+
+
+def _find_init_line_end(content):
+    """
+    Locate the first b"(:init" followed only by whitespace up to a newline.
+
+    Returns (start, end) where start is the offset of "(:init" and end is just
+    past the last newline in the whitespace run, or -1 if there is none.
+    """
+    idx = content.find(b"(:init")
+    while idx != -1:
+        ws_start = idx + 6
+        ws_end = ws_start
+        while ws_end < len(content) and content[ws_end] in b" \t\r\n\f\v":
+            ws_end += 1
+        newline = content.rfind(b"\n", ws_start, ws_end)
+        if newline != -1:
+            return idx, newline + 1
+        idx = content.find(b"(:init", idx + 1)
+    return -1
 
 
 def execute_emergency_backtrack(translator, logger):
@@ -365,7 +518,7 @@ def execute_emergency_backtrack(translator, logger):
     backtrack_sequence = [1, 1, 2]  # Turn right, turn right, forward
     
     # Inject the backtrack sequence directly into the translator buffer
-    translator.action_buffer = backtrack_sequence.copy()
+    translator.action_buffer = deque(backtrack_sequence)
     logger.info("REPLAN", f"📦 Backtrack sequence injected: {backtrack_sequence}")
     logger.info("REPLAN", "   Action 1: Turn Right (90°)")
     logger.info("REPLAN", "   Action 2: Turn Right (90°) -> Now facing opposite direction")
@@ -374,84 +527,244 @@ def execute_emergency_backtrack(translator, logger):
     return True
 
 
+@functools.lru_cache(maxsize=512)
+def _parse_pddl(action_str):
+    """
+    Split a PDDL action like '(drive loc_x_y loc_a_b)' into (name, arg1, arg2).
+    Returns (None, None, None) if it has fewer than two arguments.
+    """
+    m = _PDDL_RE.match(action_str)
+    return (m.group(1), m.group(2), m.group(3)) if m else (None, None, None)
+
+
 def get_target_from_action(pddl_action, translator):
     """
     Parses 'drive loc_x_y loc_a_b' and returns coordinate tuple (a, b).
     Returns None if action has no target.
+
+    Only the string parse is memoized (_parse_pddl); pddl_to_coord is a dict
+    lookup on the translator, which must not be kept alive by a module cache.
     """
     if not pddl_action:
         return None
-    
-    try:
-        # Remove parentheses if present
-        clean_action = pddl_action.replace('(', '').replace(')', '').strip()
-        parts = clean_action.split()
-        
-        # Check for standard drive action
-        if parts[0] == 'drive' and len(parts) >= 3:
-            target_str = parts[2]  # loc_a_b
-            return translator.pddl_to_coord(target_str)
-            
-        # Check for buy action (target is current location usually, or store loc)
-        if parts[0] == 'buy':
-            # Buy actions don't involve movement, so target is None (stay put)
-            return None
-            
-    except Exception as e:
-        logger.debug("EXECUTION", f"Error parsing target from {pddl_action}: {e}")
-        return None
+
+    # Buy actions don't involve movement, so target is None (stay put)
+    name, _, target_str = _parse_pddl(pddl_action)
+    if name == 'drive':
+        return translator.pddl_to_coord(target_str)  # loc_a_b
     return None
 
 
+# Parsed positions of the most recent plan: (plan object, its length, last-visit index map).
+# Plans are replaced, never edited in place, so identity + length identifies them.
+_plan_positions_cache = [None, 0, {}]
+
+
+def _action_positions(action):
+    """Coordinates an action moves to or acts at (drive destination / buy location)."""
+    head = action.lstrip('( ')
+    # Case A: Drive Action (drive loc_from loc_to) - only the destination counts
+    if head.startswith('drive '):
+        matches = _LOC_RE.findall(head)
+        return [(int(matches[-1][0]), int(matches[-1][1]))] if len(matches) >= 2 else []
+    # Case B: Buy Action (buy milk store loc_where) - any location arg
+    if head.startswith('buy '):
+        return [(int(x), int(y)) for x, y in _LOC_RE.findall(head)]
+    return []
+
+
+# (selling ?store ?item) facts of a problem file
+_SELLING_RE = re.compile(r'\(selling\s+([^\s()]+)\s+([^\s()]+)\)')
+# path -> (st_ino, st_mtime_ns, st_size, frozenset of (store, item))
+_selling_cache = {}
+
+
+def _selling_facts(path):
+    """
+    (store, item) pairs of the (selling ...) facts in a problem file.
+
+    Parsed once per file version: the cache is keyed on the file's stat, so
+    any writer (patcher, victory-store fix, backtrack) invalidates it.
+    """
+    st = os.stat(path)
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _selling_cache.get(path)
+    if cached and cached[:3] == key:
+        return cached[3]
+    with open(path, 'r') as f:
+        facts = frozenset(_SELLING_RE.findall(f.read()))
+    _selling_cache[path] = (*key, facts)
+    return facts
+
+
+def _bind_step(env):
+    """
+    env.step as a function returning (obs, reward, done, info).
+
+    Whether the env uses gymnasium's 5-tuple or old gym's 4-tuple is fixed
+    per env, so it is decided once here instead of on every step.
+    """
+    step = env.step
+    if isinstance(env, gym.Env):
+        def _step(action):
+            obs, reward, terminated, truncated, info = step(action)
+            return obs, reward, terminated or truncated, info
+        return _step
+    return step
+
+
+class _MockAgent:
+    """Minimal agent (pos, dir) for StateTranslator.get_micro_action."""
+    __slots__ = ('pos', 'dir')
+
+
+def _pt(pos):
+    """(x, y) of a position as plain ints (env.agent_pos may be a list, tuple or ndarray)."""
+    return (int(pos[0]), int(pos[1]))
+
+
+def _pack_pos(pos):
+    """Pack an (x, y) grid position into one int key (grids are well under 65536 wide)."""
+    return (int(pos[0]) << 16) | int(pos[1])
+
+
+def _unpack_pos(key):
+    """Inverse of _pack_pos."""
+    return key >> 16, key & 0xFFFF
+
+
+def _plan_last_positions(current_plan):
+    """Map each packed position the plan visits to the last step index visiting it (cached per plan)."""
+    cached_plan, cached_len, last_index = _plan_positions_cache
+    if cached_plan is current_plan and cached_len == len(current_plan):
+        return last_index
+
+    last_index = {}
+    for i, action in enumerate(current_plan):
+        for x, y in _action_positions(action):
+            last_index[(x << 16) | y] = i
+    _plan_positions_cache[:] = [current_plan, len(current_plan), last_index]
+    return last_index
+
+
+# Parsed entries of the plan being executed: (plan object, its length, translator, entries).
+_plan_entries_cache = [None, 0, None, []]
+
+
+def _plan_entries(current_plan, translator):
+    """
+    The plan as a list of (verb, target_pos, store_name), one per action (cached per plan).
+
+    target_pos is the drive destination (None for other actions) and
+    store_name is the store of a 'buy milk' action (None otherwise), so the
+    step loop indexes into this instead of re-parsing the action strings.
+    """
+    cached_plan, cached_len, cached_translator, entries = _plan_entries_cache
+    if cached_plan is current_plan and cached_len == len(current_plan) and cached_translator is translator:
+        return entries
+
+    entries = []
+    for action in current_plan:
+        verb, _, last_arg = _parse_pddl(action)
+        store_name = last_arg if "buy milk" in action.lower() else None
+        entries.append((verb, get_target_from_action(action, translator), store_name))
+    _plan_entries_cache[:] = [current_plan, len(current_plan), translator, entries]
+    return entries
+
+
 def is_blocking_path(obj_pos, current_plan, current_step_index=0, translator=None):
     """
     OPTIMIZED VERSION: Check if discovered object blocks the REMAINING path.
     Handles 'drive' AND 'buy' actions correctly.
+
+    The plan is parsed once into a packed position -> last step index map, so
+    each check is a single int-keyed dict lookup against the current step.
     """
     if not current_plan or current_step_index >= len(current_plan):
         logger.debug("PATH_CHECK", "No remaining plan to check")
         return False
 
-    future_positions = set()
-
-    for i in range(current_step_index, len(current_plan)):
-        action = current_plan[i]
-        parts = action.replace('(', '').replace(')', '').split()
-        
-        # Case A: Drive Action (drive loc_from loc_to)
-        if parts[0] == 'drive' and len(parts) >= 3:
-            # Check destination
-            if 'loc_' in parts[2]:
-                try:
-                    coords = parts[2].replace("loc_", "").split("_")
-                    if len(coords) == 2:
-                        future_positions.add((int(coords[0]), int(coords[1])))
-                except Exception:
-                    pass
-
-        # Case B: Buy Action (buy milk store loc_where)
-        elif parts[0] == 'buy':
-            # Look for location arg
-            for p in parts:
-                if 'loc_' in p:
-                    try:
-                        coords = p.replace("loc_", "").split("_")
-                        if len(coords) == 2:
-                            future_positions.add((int(coords[0]), int(coords[1])))
-                    except Exception:
-                        pass
-
-    is_blocking = obj_pos in future_positions
+    last_index = _plan_last_positions(current_plan)
+    is_blocking = last_index.get(_pack_pos(obj_pos), -1) >= current_step_index
     
     if is_blocking:
+        # Only the first five remaining positions are logged - stop scanning there
+        future_positions = list(islice(
+            (_unpack_pos(key) for key, i in last_index.items() if i >= current_step_index), 5
+        ))
         logger.info("PATH_CHECK", f"🚧 Object at {obj_pos} BLOCKS remaining path!")
-        logger.debug("PATH_CHECK", f"Future positions: {sorted(list(future_positions)[:5])}...")
+        logger.debug("PATH_CHECK", f"Future positions: {sorted(future_positions)}...")
     else:
         logger.debug("PATH_CHECK", f"✓ Object at {obj_pos} does NOT block path")
     
     return is_blocking
 
 
+@functools.lru_cache(maxsize=None)
+def _translator_fix_indicators(func):
+    """
+    Key indicators of the StateTranslator direction fix in func's source:
+    (has direction_map, has dx/dy delta calculation, has turn logic).
+
+    Cached per function object, so the source file is read and scanned once
+    per process rather than once per experiment run.
+    """
+    source = inspect.getsource(func)
+    return (
+        "direction_map" in source,
+        "dx =" in source and "dy =" in source,
+        "turns_needed" in source,
+    )
+
+
+# Grid move delta -> MiniGrid direction (0=right, 1=down, 2=left, 3=up)
+_DIR_MAP = {(1, 0): 0, (0, 1): 1, (-1, 0): 2, (0, -1): 3}
+
+# The four grid moves; two cells are adjacent iff their delta is one of these
+_UNIT_STEPS = frozenset(_DIR_MAP)
+
+# MiniGrid direction -> grid move delta (inverse of _DIR_MAP), indexed by agent_dir
+_DIR_DELTAS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+# Motor action -> name for log lines
+_ACTION_NAMES = {0: "TurnLeft", 1: "TurnRight", 2: "Forward", 6: "Done"}
+
+# Motor actions that only rotate the agent in place
+_TURN_ACTIONS = frozenset({0, 1})
+
+# Cell types the agent cannot step into
+_BLOCKING_TYPES = frozenset({'wall', 'obstacle', 'lava', 'ball'})
+
+# Motor actions to face required_dir from current_dir and step forward,
+# indexed [current_dir][required_dir] (1=turn right, 0=turn left, 2=forward)
+_TURN_SEQUENCES = ((2,), (1, 2), (1, 1, 2), (0, 2))  # by clockwise quarter turns
+_TURN_LUT = tuple(
+    tuple(_TURN_SEQUENCES[(required - current) % 4] for required in range(4))
+    for current in range(4)
+)
+
+
+def _is_adjacent(pos, target):
+    """True if target is one grid step (4-neighborhood) away from pos."""
+    return (target[0] - pos[0], target[1] - pos[1]) in _UNIT_STEPS
+
+
+# Perception results keyed by normalized object name. Analyses are deterministic
+# per name, so a rediscovered object never costs a second LLM round-trip.
+# Cleared at the start of every experiment run.
+_analysis_cache = {}
+
+
+def _analyze_cached(reasoner, discovery_name):
+    """Memoized reasoner.analyze_observation()."""
+    key = discovery_name.strip().lower()
+    analysis = _analysis_cache.get(key)
+    if analysis is None:
+        analysis = reasoner.analyze_observation(discovery_name)
+        _analysis_cache[key] = analysis
+    return analysis
+
+
 def should_replan_for_discovery(new_discovery, current_plan, current_step_index, 
                                  algorithm_mode, reasoner, state_manager, env=None):
     """
@@ -463,13 +776,30 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
     
     logger.info("SMART_REPLAN", f"Evaluating: {discovery_name} at {discovery_pos}")
     
+    # 0. Algorithm A (Blind): only physical blocking matters, so decide here
+    # without touching the reasoner or the algorithm-specific branches below
+    if algorithm_mode == 'A':
+        if is_blocking_path(discovery_pos, current_plan, current_step_index):
+            logger.warning("SMART_REPLAN", "Object blocks path - must replan")
+            return {
+                'should_replan': True,
+                'reason': 'obstacle_blocking_path',
+                'metadata': {'type': 'obstacle', 'blocks_path': True}
+            }
+        logger.info("SMART_REPLAN", "Algo A: Ignoring discovery")
+        return {
+            'should_replan': False, 
+            'reason': 'algo_a_ignore', 
+            'metadata': {'type': 'ignored'}
+        }
+    
     # 1. Algorithm C: Semantic Analysis FIRST (Priority Check)
     # If it's a store, we need LLM strategic decision to determine if we visit it
     obj_is_store = False
     if algorithm_mode == 'C':  # LLM Strategic
         logger.info("SMART_REPLAN", "Algo C: Running semantic analysis first")
         try:
-            analysis = reasoner.analyze_observation(discovery_name)
+            analysis = _analyze_cached(reasoner, discovery_name)
             if analysis.get('sells_milk', False):
                 # It's a store! Now get strategic decision: visit or ignore?
                 obj_is_store = True
@@ -523,12 +853,14 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
     # This ensures stores are always marked as stores, even if they block the path
     if algorithm_mode == 'B':  # Obsessive
         logger.info("SMART_REPLAN", "Algo B: Always replan - checking if store first")
-        analysis = reasoner.analyze_observation(discovery_name)
-        obj_type = 'store' if analysis.get('sells_milk', False) else 'obstacle'
-        
-        # Check if it blocks path (but keep the original type)
+        # Check if it blocks path (but keep the original type). This is the cheap
+        # check, so it runs first; the analysis is still needed on every path
+        # because the store/obstacle type decides the outcome either way.
         is_blocking = is_blocking_path(discovery_pos, current_plan, current_step_index)
         
+        analysis = _analyze_cached(reasoner, discovery_name)
+        obj_type = 'store' if analysis.get('sells_milk', False) else 'obstacle'
+        
         if obj_type == 'store':
             # It's a store - always mark as store, even if blocking
             logger.info("SMART_REPLAN", f"Algo B: {discovery_name} is a store (blocks={is_blocking})")
@@ -559,7 +891,7 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
                     'metadata': {'type': 'obstacle'}
                 }
     
-    # 3. Physical Blocking Check (Fallback for Algo A/D or non-stores in Algo C)
+    # 3. Physical Blocking Check (Fallback for Algo D or non-stores in Algo C)
     # Only check blocking if we haven't already determined it's a store
     if not obj_is_store:  # Don't check blocking if it's a store (already handled above)
         is_blocking = is_blocking_path(discovery_pos, current_plan, current_step_index)
@@ -572,15 +904,7 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
             }
 
     # 4. Algorithm-Specific Logic (for non-blocking objects)
-    if algorithm_mode == 'A':  # Blind
-        logger.info("SMART_REPLAN", "Algo A: Ignoring discovery")
-        return {
-            'should_replan': False, 
-            'reason': 'algo_a_ignore', 
-            'metadata': {'type': 'ignored'}
-        }
-        
-    elif algorithm_mode == 'C':  # LLM Strategic
+    if algorithm_mode == 'C':  # LLM Strategic
         # Note: If we reached here, it means:
         # 1. LLM analysis didn't identify it as a store, OR
         # 2. Object doesn't block path (and is not a store)
@@ -595,7 +919,7 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
     elif algorithm_mode == 'D':  # Math Formula
         logger.info("SMART_REPLAN", "Algo D: Math-based heuristic")
         # Analyze observation using LLM
-        analysis = reasoner.analyze_observation(discovery_name)
+        analysis = _analyze_cached(reasoner, discovery_name)
         
         if not analysis.get('sells_milk', False):
             logger.info("SMART_REPLAN", "Not a milk store - no replan")
@@ -653,13 +977,103 @@ def should_replan_for_discovery(new_discovery, current_plan, current_step_index,
     }
 
 
+def _resolve_price_paid(store_name, curr_pos, env, state_manager, surprise_obj):
+    """Price paid at store_name: discovered price, then the cell's price, then the scenario's true price."""
+    # Try to determine price paid (4.0 default)
+    price_paid = state_manager.store_price_index.get(store_name, 4.0)
+
+    # Fallback: use the cell's stored price if available
+    cell = env.grid.get(curr_pos[0], curr_pos[1])
+    if price_paid == 4.0 and cell is not None and hasattr(cell, 'price'):
+        try:
+            price_paid = float(cell.price)
+        except Exception:
+            pass
+
+    # Final fallback: use scenario surprise object price by position
+    if price_paid == 4.0 and surprise_obj:
+        try:
+            if tuple(surprise_obj.get('position', ())) == curr_pos:
+                true_price = surprise_obj.get('true_price')
+                if true_price is not None:
+                    price_paid = float(true_price)
+        except Exception:
+            pass
+
+    # Prefer the scenario true price for the surprise store
+    if surprise_obj and store_name == surprise_obj.get('name'):
+        try:
+            true_price = surprise_obj.get('true_price')
+            if true_price is not None:
+                price_paid = float(true_price)
+        except Exception:
+            pass
+    return price_paid
+
+
+def log_movement_reality(agent_dir, action, pos_before, pos_after):
+    """Log what REALLY happened when action executed."""
+    dx = pos_after[0] - pos_before[0]
+    dy = pos_after[1] - pos_before[1]
+
+    logger.info("REALITY", "%s: %s → %s", _ACTION_NAMES.get(action, action), pos_before, pos_after)
+    logger.info("REALITY", "Delta: dx=%s, dy=%s, dir=%s", dx, dy, agent_dir)
+
+    if action == 2:  # Forward
+        if dx == 1 and dy == 0:
+            logger.info("REALITY", "✅ Agent facing RIGHT (dir=%s)", agent_dir)
+        elif dx == 0 and dy == 1:
+            logger.info("REALITY", "⚠️  Agent facing DOWN (dir=%s)", agent_dir)
+        elif dx == -1 and dy == 0:
+            logger.info("REALITY", "⚠️  Agent facing LEFT (dir=%s)", agent_dir)
+        elif dx == 0 and dy == -1:
+            logger.info("REALITY", "⚠️  Agent facing UP (dir=%s)", agent_dir)
+
+
+def _execute_buy(store_name, curr_pos, env, env_step, state_manager, surprise_obj):
+    """
+    Execute a plan's buy action at store_name with the Toggle action (5).
+
+    Returns:
+        The price paid, or None if the purchase failed
+    """
+    logger.info("BUY_ACTION", f"💳 Executing buy action for {store_name} at {curr_pos}")
+
+    # CRITICAL FIX: Actually execute the purchase!
+    obs, reward, done_env, info = env_step(5)
+
+    # Check if purchase was successful
+    if done_env or reward > 0:
+        price_paid = _resolve_price_paid(store_name, curr_pos, env, state_manager, surprise_obj)
+        logger.info("BUY_ACTION", f"✅ Successfully bought milk at {store_name}! Price: ${price_paid:.2f}")
+        return price_paid
+
+    # Verify store sells milk (from PDDL) as fallback check
+    try:
+        if (store_name, 'milk') in _selling_facts("problem_initial.pddl"):
+            logger.warning("BUY_ACTION", f"⚠️ Toggle executed but no reward - assuming purchase succeeded (PDDL confirms store sells milk)")
+            # Resolve price even without reward
+            return _resolve_price_paid(store_name, curr_pos, env, state_manager, surprise_obj)
+        logger.warning("BUY_ACTION", f"⚠️ Purchase failed - {store_name} doesn't sell milk in PDDL!")
+    except Exception as e:
+        logger.error("EXECUTION", f"Error reading PDDL: {e}")
+    return None
+
+
 def run_live_dashboard():
     """
     COMPARATIVE EXPERIMENT FRAMEWORK: Testing 4 Cognitive Architectures
+
+    Returns True once the experiment completes and its results are logged,
+    False if it exits early (invalid scenario or no initial plan).
     """
     # --- EXPERIMENT CONFIGURATION ---
     ALGORITHM_MODE = os.environ.get('ALGORITHM_MODE', 'C').upper()  # A/B/C/D
     SCENARIO_ID = os.environ.get('SCENARIO_ID', 'SCENARIO_4')
+    _analysis_cache.clear()  # LLM call counts must not leak between runs in one process
+    # The per-plan caches hold the previous run's plan and translator (and its env)
+    _plan_entries_cache[:] = [None, 0, None, []]
+    _plan_positions_cache[:] = [None, 0, {}]
 
     logger.info("EXPERIMENT", f"=== STARTING COMPARATIVE EXPERIMENT ===")
     logger.info("EXPERIMENT", f"Algorithm: {ALGORITHM_MODE}, Scenario: {SCENARIO_ID}")
@@ -669,7 +1083,7 @@ def run_live_dashboard():
     scenario = get_scenario(SCENARIO_ID)
     if not scenario:
         logger.error("EXPERIMENT", f"Invalid scenario: {SCENARIO_ID}")
-        return
+        return False
 
     logger.info("SCENARIO", f"Loaded: {scenario['name']}")
     logger.info("SCENARIO", f"Description: {scenario['description']}")
@@ -678,7 +1092,6 @@ def run_live_dashboard():
     experiment_start_time = results_logger.start_experiment_timer()
 
     # 1. INIT EXPERIMENT ENVIRONMENT (Scenario-based)
-    import numpy as np
     # Seed is handled by custom_env.py based on USE_FIXED_SEED environment variable
     # If USE_FIXED_SEED=true and SEED is set, env will use fixed seed for reproducibility
     # If USE_FIXED_SEED=false, env will use random seed
@@ -706,6 +1119,7 @@ def run_live_dashboard():
     )
 
     obs, info = env.reset()
+    env_step = _bind_step(env)
     logger.info("ENV", f"Environment initialized: {env.width}x{env.height} grid")
     logger.info("ENV", f"Start: {scenario['start_pos']}, Victory: {scenario['victory_pos']}")
 
@@ -723,7 +1137,7 @@ def run_live_dashboard():
     translator = StateTranslator(env)
     # Safety: Clear buffer at initialization
     if hasattr(translator, 'action_buffer'):
-        translator.action_buffer = []
+        translator.action_buffer = deque()
     # Initialize LLM with "stingy" personality (100% price, 0% distance)
     reasoner = LLMReasoner(price_weight=1.0, dist_weight=0.0)
     patcher = PDDLPatcher("problem_initial.pddl")
@@ -731,14 +1145,11 @@ def run_live_dashboard():
     # ========== EMERGENCY DIAGNOSTIC: Verify StateTranslator Fix ==========
     def verify_translator_fix(translator):
         """Verify that StateTranslator.get_micro_action() was fixed"""
-        import inspect
         try:
-            source = inspect.getsource(translator.get_micro_action)
-            
-            # Check for key indicators of the fix
-            has_direction_map = "direction_map" in source
-            has_delta_calc = "dx =" in source and "dy =" in source
-            has_turn_logic = "turns_needed" in source
+            method = translator.get_micro_action
+            has_direction_map, has_delta_calc, has_turn_logic = _translator_fix_indicators(
+                getattr(method, '__func__', method)
+            )
             
             logger.info("DIAGNOSTIC", "========== StateTranslator Fix Verification ==========")
             logger.info("DIAGNOSTIC", f"Has direction_map: {has_direction_map}")
@@ -763,6 +1174,13 @@ def run_live_dashboard():
         
         # Save original method
         original_get_micro_action = translator.get_micro_action
+
+        # Make sure the buffer state exists up front so the patch can use
+        # plain attribute access on every micro-action
+        if not hasattr(translator, 'action_buffer'):
+            translator.action_buffer = deque()
+        if not hasattr(translator, '_current_target'):
+            translator._current_target = None
         
         def patched_get_micro_action(pddl_action, agent):
             """Emergency patched version that correctly handles directions"""
@@ -771,79 +1189,50 @@ def run_live_dashboard():
                 return 6, None
             
             # Handle buffer first
-            if hasattr(translator, 'action_buffer') and translator.action_buffer:
-                target_pos = getattr(translator, '_current_target', None)
-                action = translator.action_buffer.pop(0)
+            if translator.action_buffer:
+                target_pos = translator._current_target
+                action = translator.action_buffer.popleft()
                 return action, target_pos
             
-            parts = pddl_action.replace('(', '').replace(')', '').split()
-            action_type = parts[0] if parts else None
+            head = pddl_action.lstrip('( ')
             
-            # Handle DRIVE
-            if action_type == 'drive' and len(parts) >= 3:
-                to_loc = parts[2]  # loc_X_Y
+            # Handle DRIVE (drive loc_from loc_to) - the destination is the last location
+            if head.startswith('drive '):
+                locs = _LOC_RE.findall(head)
+                if len(locs) < 2:
+                    return 6, None
                 
-                try:
-                    to_coords = to_loc.replace("loc_", "").split("_")
-                    if len(to_coords) != 2:
-                        return 6, None
-                    
-                    target_x, target_y = int(to_coords[0]), int(to_coords[1])
-                    target_pos = (target_x, target_y)
-                    
-                    current_pos = tuple(agent.pos)
-                    current_dir = agent.dir
-                    
-                    # Calculate delta
-                    dx = target_x - current_pos[0]
-                    dy = target_y - current_pos[1]
-                    
-                    logger.debug("PATCH", f"Drive: {current_pos} → {target_pos}, delta=({dx},{dy}), dir={current_dir}")
-                    
-                    # Map to direction
-                    direction_map = {
-                        (1, 0): 0,   # Right
-                        (0, 1): 1,   # Down
-                        (-1, 0): 2,  # Left
-                        (0, -1): 3   # Up
-                    }
-                    
-                    required_dir = direction_map.get((dx, dy))
-                    
-                    if required_dir is None:
-                        logger.error("PATCH", f"Invalid delta ({dx}, {dy})")
-                        return 6, None
-                    
-                    # Calculate turns
-                    turns_needed = (required_dir - current_dir) % 4
-                    
-                    logger.debug("PATCH", f"Required_dir={required_dir}, Turns={turns_needed}")
-                    
-                    # Build action sequence
-                    actions = []
-                    if turns_needed == 1:
-                        actions.append(1)
-                    elif turns_needed == 2:
-                        actions.extend([1, 1])
-                    elif turns_needed == 3:
-                        actions.append(0)
-                    
-                    actions.append(2)  # Forward
-                    
-                    # Store in buffer
-                    translator.action_buffer = actions[1:] if len(actions) > 1 else []
-                    translator._current_target = target_pos
-                    
-                    logger.debug("PATCH", f"Sequence: {actions}")
-                    
-                    return actions[0], target_pos
-                    
-                except Exception as e:
-                    logger.error("PATCH", f"Error: {e}")
+                target_pos = (int(locs[-1][0]), int(locs[-1][1]))
+                current_pos = tuple(agent.pos)
+                current_dir = agent.dir
+                
+                # Calculate delta
+                dx = target_pos[0] - current_pos[0]
+                dy = target_pos[1] - current_pos[1]
+                
+                logger.debug("PATCH", f"Drive: {current_pos} → {target_pos}, delta=({dx},{dy}), dir={current_dir}")
+                
+                if dx * dx + dy * dy != 1:
+                    logger.error("PATCH", f"Invalid delta ({dx}, {dy})")
                     return 6, None
+                
+                # Closed form of _DIR_MAP for unit deltas: dy == 0 gives 1 - dx
+                # (right=0, left=2), dx == 0 gives 2 - dy (down=1, up=3)
+                required_dir = 1 - dx - dy + dy * dy
+                
+                # Turns + forward, looked up for this (current, required) direction pair
+                actions = _TURN_LUT[current_dir][required_dir]
+                
+                logger.debug("PATCH", f"Required_dir={required_dir}, Sequence: {list(actions)}")
+                
+                # Store the rest in the buffer
+                translator.action_buffer = deque(actions[1:])
+                translator._current_target = target_pos
+                
+                return actions[0], target_pos
             
             # Handle BUY
-            elif action_type == 'buy':
+            elif head.startswith('buy'):
                 return 6, None
             
             return 6, None
@@ -864,25 +1253,29 @@ def run_live_dashboard():
         # Check if target is reachable
         dx = target_pos[0] - current_pos[0]
         dy = target_pos[1] - current_pos[1]
-        distance = abs(dx) + abs(dy)  # Manhattan distance
+        # Grid moves are unit steps, so adjacency is exactly dx² + dy² == 1
+        dist_sq = dx*dx + dy*dy
         
-        logger.info("PDDL_DIAG", f"Delta: ({dx}, {dy}), Manhattan distance: {distance}")
+        logger.info("PDDL_DIAG", f"Delta: ({dx}, {dy}), squared distance: {dist_sq}")
         
-        if distance != 1:
-            logger.error("PDDL_DIAG", f"❌ Target is NOT adjacent! Distance={distance}")
+        if dist_sq != 1:
+            logger.error("PDDL_DIAG", f"❌ Target is NOT adjacent! Squared distance={dist_sq}")
             logger.error("PDDL_DIAG", "This means PDDL has incorrect connectivity!")
             
             # Check if the PDDL file has the correct connection
             try:
-                with open("problem_initial.pddl", "r") as f:
-                    pddl_content = f.read()
-                
                 from_loc = f"loc_{current_pos[0]}_{current_pos[1]}"
                 to_loc = f"loc_{target_pos[0]}_{target_pos[1]}"
                 
-                # Check if connection exists
-                connection_forward = f"(connected {from_loc} {to_loc})" in pddl_content
-                connection_backward = f"(connected {to_loc} {from_loc})" in pddl_content
+                # Check if connection exists (patcher's connectivity set, or the file
+                # itself if the patcher didn't write the connectivity)
+                connection_forward = patcher.has_connection(from_loc, to_loc)
+                connection_backward = patcher.has_connection(to_loc, from_loc)
+                if connection_forward is None:
+                    with open("problem_initial.pddl", "r") as f:
+                        pddl_content = f.read()
+                    connection_forward = f"(connected {from_loc} {to_loc})" in pddl_content
+                    connection_backward = f"(connected {to_loc} {from_loc})" in pddl_content
                 
                 logger.info("PDDL_DIAG", f"Connection {from_loc} → {to_loc}: {connection_forward}")
                 logger.info("PDDL_DIAG", f"Connection {to_loc} → {from_loc}: {connection_backward}")
@@ -914,49 +1307,37 @@ def run_live_dashboard():
     victory_loc = f"loc_{victory_pos[0]}_{victory_pos[1]}"
     
     # Generate all grid locations for :objects section
-    all_locations = []
-    for x in range(env.width):
-        for y in range(env.height):
-            all_locations.append(f"loc_{x}_{y}")
-    locations_str = " ".join(all_locations)
+    locations_str = grid_locations_str(env.width, env.height)
     
     # Generate fresh problem_initial.pddl
     # We define 'victory' explicitly as a store to prevent typing errors
-    with open("problem_initial.pddl", "w") as f:
-            f.write(f"""(define (problem supermarket-navigation-problem)
-    (:domain supermarket-navigation)
-    (:objects
-      agent - agent
-      {locations_str} - location
-      victory - store
-      milk - item
-    )
-    (:init
-      (at_agent agent {start_loc})
+    # Static text comes from the module-level template; only the locations
+    # and the dynamic :init facts are spliced in
+    content = "".join([
+        _PROBLEM_HEAD, locations_str, _PROBLEM_OBJECTS_TAIL,
+        f"""      (at_agent agent {start_loc})
       (at_store victory {victory_loc})
       (selling victory milk)
       (clear {victory_loc})
-    )
-    (:goal (and (have agent milk)))
-    )""")
+""",
+        _PROBLEM_TAIL,
+    ])
 
-    # TEMPORARY FIX: Validate PDDL structure after creation
-    with open("problem_initial.pddl", "r") as f:
-        content = f.read()
-        open_count = content.count('(')
-        close_count = content.count(')')
-
-        if open_count != close_count:
-            logger.error("PDDL", f"❌ Parentheses mismatch after initial creation! Open: {open_count}, Close: {close_count}")
-
-            # Try to fix by ensuring proper closure
-            diff = open_count - close_count
-            if diff > 0:
-                # Need more closing parens
-                content += '\n' + ')' * diff
-                with open("problem_initial.pddl", "w") as f:
-                    f.write(content)
-                logger.info("PDDL", f"✅ Auto-fixed by adding {diff} closing parentheses")
+    # TEMPORARY FIX: Validate PDDL structure before writing (no read-back needed)
+    open_count, close_count = _paren_counts(content)
+
+    if open_count != close_count:
+        logger.error("PDDL", f"❌ Parentheses mismatch after initial creation! Open: {open_count}, Close: {close_count}")
+
+        # Try to fix by ensuring proper closure
+        diff = open_count - close_count
+        if diff > 0:
+            # Need more closing parens
+            content += '\n' + ')' * diff
+            logger.info("PDDL", f"✅ Auto-fixed by adding {diff} closing parentheses")
+
+    with open("problem_initial.pddl", "w") as f:
+        f.write(content)
 
     # Initialize grid connectivity for all locations
     patcher.init_grid_connectivity(env.width, env.height)
@@ -968,6 +1349,10 @@ def run_live_dashboard():
     # GUI Setup for Large 50x50 Grid
     plt.ion()
     fig, ax = plt.subplots(figsize=(12, 12))
+    ax.axis('off')
+    frame_artist = None  # AxesImage reused every step via set_data()
+    # Headless backends (Agg in parallel experiment runs) have no window to update
+    live_view = type(fig.canvas).required_interactive_framework is not None
 
     # Research state tracking
     visual_memory = set()
@@ -981,36 +1366,38 @@ def run_live_dashboard():
     final_price_paid = None  # Track the actual price paid for milk
 
     # --- STUCK WATCHDOG VARIABLES ---
-    last_pos = None
+    last_pos_key = -1  # _pack_pos() of the last position seen by the stuck watchdog
     stuck_counter = 0
     just_skipped = False
     last_action = None  # Track last executed action for turn tolerance
 
     # Initialize replan_triggered before the loop
     replan_triggered = False
+    # Collision positions not yet written to the PDDL; flushed in one batch before each replan
+    pending_blocked = set()
 
     # --- STEP INDEX TRACKING ---
     current_step_index = 0  # Track current PDDL plan step index
 
     # --- INFINITE LOOP PROTECTION ---
-    last_error_msg = None
+    last_error_hash = None  # hash() of the last error - the message itself isn't kept
     error_repeat_count = 0
     max_error_repeats = 5
 
     def check_infinite_loop(error_msg):
         """Check for infinite loops and exit if too many repeated errors"""
-        nonlocal last_error_msg, error_repeat_count
+        nonlocal last_error_hash, error_repeat_count
 
-        if error_msg == last_error_msg:
+        error_hash = hash(error_msg)
+        if error_hash == last_error_hash:
             error_repeat_count += 1
             if error_repeat_count >= max_error_repeats:
                 logger.critical("INFINITE LOOP", f"Same error repeated {error_repeat_count} times: {error_msg}")
                 logger.critical("INFINITE LOOP", "EXITING TO PREVENT INFINITE LOOP")
-                import sys
                 sys.exit(1)
         else:
             error_repeat_count = 1
-            last_error_msg = error_msg
+            last_error_hash = error_hash
 
     # --- STATE MANAGER ---
     state_manager = StateManager()
@@ -1079,30 +1466,14 @@ def run_live_dashboard():
     state_manager.update_agent_pos(env.agent_pos)
 
     # FINAL VALIDATION: Ensure PDDL file has :goal section and is syntactically valid
+    # (checked and repaired in memory; the file is rewritten only if something changed)
     with open("problem_initial.pddl", "r") as f:
         final_content = f.read()
 
-    if "(:goal" not in final_content:
-        logger.error("PDDL", "❌ CRITICAL: :goal section missing from PDDL! Adding it back...")
-        # Find the last ) and add :goal before it
-        last_paren = final_content.rfind(")")
-        if last_paren != -1:
-            fixed_content = final_content[:last_paren] + "\n    (:goal (and (have agent milk)))\n" + final_content[last_paren:]
-            with open("problem_initial.pddl", "w") as f:
-                f.write(fixed_content)
-            logger.info("PDDL", "✅ :goal section restored")
-
-    # Final parentheses check
-    open_count = final_content.count('(')
-    close_count = final_content.count(')')
-    if open_count != close_count:
-        logger.error("PDDL", f"❌ CRITICAL: Parentheses imbalance! Open: {open_count}, Close: {close_count}")
-        # Emergency fix: add missing closing parens
-        diff = open_count - close_count
-        if diff > 0:
-            with open("problem_initial.pddl", "a") as f:
-                f.write('\n' + ')' * diff)
-            logger.info("PDDL", f"✅ Added {diff} missing closing parentheses")
+    fixed_content = validate_and_fix(final_content)
+    if fixed_content != final_content:
+        with open("problem_initial.pddl", "w") as f:
+            f.write(fixed_content)
 
     try:
         current_plan = runner.run_planner("domain.pddl", "problem_initial.pddl")
@@ -1115,10 +1486,7 @@ def run_live_dashboard():
                 first_action = current_plan[0]
                 first_target = get_target_from_action(first_action, translator)
                 if first_target:
-                    dx = first_target[0] - env.agent_pos[0]
-                    dy = first_target[1] - env.agent_pos[1]
-                    manhattan = abs(dx) + abs(dy)
-                    if manhattan != 1:
+                    if not _is_adjacent(env.agent_pos, first_target):
                         logger.error("PLANNER", f"❌ First plan action invalid! Target {first_target} not adjacent to {env.agent_pos}")
                     else:
                         logger.info("PLANNER", f"✅ First action validated: {first_action} → {first_target}")
@@ -1136,12 +1504,23 @@ def run_live_dashboard():
         
         logger.warning("PLANNER", "No initial plan available - terminating")
         current_plan = []
-        return  # Exit early
+        return False  # Exit early
 
     done = False
 
+    # The grid object and its size are fixed for the run - bind them once
+    grid_w, grid_h = env.grid.width, env.grid.height
+    grid_get = env.grid.get
+
+    # Agent snapshot handed to the translator on each buffer refill
+    mock_agent = _MockAgent()
+
+    # Per-step timing is only reported at DEBUG; skip the clock reads otherwise
+    log_step_times = logger.is_enabled_for(logging.DEBUG)
+
     while not done and step < 200:
-        step_start_time = time.time()
+        if log_step_times:
+            step_start_time = time.time()
         
         # Check if victory was achieved (from buy actions in PHASE 6 or PHASE 4)
         if victory_achieved:
@@ -1149,24 +1528,17 @@ def run_live_dashboard():
             break
 
         # ========== GENERIC VICTORY CHECK - Check if agent is at ANY store ==========
-        # Collect all known store locations (from state_manager and scenario)
-        store_locations = set()
-        
-        # Add victory store position
-        store_locations.add(victory_pos)
-        
-        # Add all discovered stores from state_manager
-        for obj_name, obj_data in state_manager.discovered_objects.items():
-            if obj_data.get('type') == 'store' and 'pos' in obj_data:
-                store_locations.add(tuple(obj_data['pos']))
-        
-        # Check if agent is currently standing on a store
-        current_agent_pos_tuple = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
-        current_cell = env.grid.get(*env.agent_pos) if 0 <= env.agent_pos[0] < env.width and 0 <= env.agent_pos[1] < env.height else None
+        # Check if agent is currently standing on a store. Known stores are the
+        # victory store plus state_manager.store_positions (cached until the next
+        # discovery); the position is taken as plain ints once and reused until
+        # the agent moves this step
+        current_agent_pos_tuple = _pt(env.agent_pos)
+        agent_x, agent_y = current_agent_pos_tuple
+        current_cell = grid_get(agent_x, agent_y) if 0 <= agent_x < grid_w and 0 <= agent_y < grid_h else None
         
         # Check if we're on a store: either on a 'ball' (goal/store object) or at a known store location
         is_on_store = False
-        if current_agent_pos_tuple in store_locations:
+        if current_agent_pos_tuple == victory_pos or current_agent_pos_tuple in state_manager.store_positions:
             is_on_store = True
             logger.info("VICTORY", f"🏆 Agent at known store location {current_agent_pos_tuple}!")
         elif current_cell and current_cell.type == 'ball':
@@ -1182,12 +1554,7 @@ def run_live_dashboard():
             logger.info("VICTORY", f"🎯 Agent at store/goal {current_agent_pos_tuple}! Attempting to buy milk...")
             
             # Send 'Toggle' action (5) to buy/pickup
-            step_result = env.step(5)
-            if len(step_result) == 5:
-                obs, reward, terminated, truncated, info = step_result
-                done = terminated or truncated
-            else:
-                obs, reward, done, info = step_result
+            obs, reward, done, info = env_step(5)
             
             # Check if we successfully bought milk
             if done or reward > 0:
@@ -1196,13 +1563,9 @@ def run_live_dashboard():
                 price_paid = 4.0  # Default to victory price
                 
                 # Find which store we're at
-                for obj_name, obj_data in state_manager.discovered_objects.items():
-                    if obj_data.get('type') == 'store' and 'pos' in obj_data:
-                        if tuple(obj_data['pos']) == current_agent_pos_tuple:
-                            store_name = obj_name
-                            if 'properties' in obj_data and 'price' in obj_data['properties']:
-                                price_paid = obj_data['properties']['price']
-                            break
+                store_name = state_manager.store_at(current_agent_pos_tuple)
+                if store_name:
+                    price_paid = state_manager.store_price_index.get(store_name, price_paid)
                 
                 # If not found, check if it's victory
                 if not store_name and current_agent_pos_tuple == victory_pos:
@@ -1244,12 +1607,15 @@ def run_live_dashboard():
         # =============================================================================
 
         # --- STUCK WATCHDOG LOGIC ---
+        # Positions are compared as packed ints: env.agent_pos may be a numpy
+        # array, where == is elementwise and can't be used as a condition
         current_pos = env.agent_pos
-        if current_pos == last_pos:
+        pos_key = _pack_pos(current_pos)
+        if pos_key == last_pos_key:
             stuck_counter += 1
         else:
             stuck_counter = 0
-            last_pos = current_pos
+            last_pos_key = pos_key
 
         # Recovery: If stuck for 6 frames, force full replan
         if stuck_counter > 6:
@@ -1268,23 +1634,28 @@ def run_live_dashboard():
         
         # Reduced loop logging - only log every 10 steps or on important events
         if step % 10 == 0 or replan_triggered:
-            logger.debug("LOOP", f"=== STEP {step} START ===")
-            logger.debug("LOOP", f"Agent position: {env.agent_pos}, Direction: {env.agent_dir}")
-            logger.debug("LOOP", f"Plan remaining: {len(current_plan)} actions")
+            logger.debug("LOOP", "=== STEP %s START ===", step)
+            logger.debug("LOOP", "Agent position: %s, Direction: %s", env.agent_pos, env.agent_dir)
+            logger.debug("LOOP", "Plan remaining: %d actions", len(current_plan))
 
         # --- STATE MANAGEMENT ---
         state_manager.update_agent_pos(env.agent_pos)
 
         # 1. VISUAL RENDERING
-        img = env.render()
-        ax.clear()
-        ax.imshow(img)
-        ax.axis('off')
-        status = f"Step: {step} | Plan: {len(current_plan)} | Cost: ${total_cost:.1f}"
-        if stuck_counter > 2:
-            status += " | ⚠️ STUCK DETECTED"
-        ax.set_title(status)
-        plt.pause(0.02)
+        # Update the existing image in place and let the GUI process events
+        # without the fixed plt.pause() sleep; nothing to draw when headless
+        if live_view:
+            img = env.render()
+            if frame_artist is None:
+                frame_artist = ax.imshow(img)
+            else:
+                frame_artist.set_data(img)
+            status = f"Step: {step} | Plan: {len(current_plan)} | Cost: ${total_cost:.1f}"
+            if stuck_counter > 2:
+                status += " | ⚠️ STUCK DETECTED"
+            ax.set_title(status)
+            fig.canvas.draw_idle()
+            fig.canvas.flush_events()
 
         # 2. PERCEPTION
         new_discovery = detect_new_entities(None, ['victory'], env, visual_memory=visual_memory)
@@ -1301,9 +1672,10 @@ def run_live_dashboard():
             new_discovery['walking_distance'] = true_walking_distance
             discoveries.append(new_discovery)
 
-            # Visual feedback
-            ax.set_title(f"🔍 DISCOVERED: {new_discovery['name']} (Walk: {true_walking_distance})")
-            plt.pause(0.5)
+            # Visual feedback (held on screen briefly; skipped when headless)
+            if live_view:
+                ax.set_title(f"🔍 DISCOVERED: {new_discovery['name']} (Walk: {true_walking_distance})")
+                plt.pause(0.5)
 
             # ========== STEP 2: Smart Replan Decision ==========
             logger.info("ALGORITHM", f"Processing with Algorithm {ALGORITHM_MODE}")
@@ -1338,7 +1710,7 @@ def run_live_dashboard():
             logger.debug("KNOWLEDGE", f"Added {new_discovery['name']} to PDDL knowledge")
             
             # Add to visual memory
-            visual_memory.add((store_pos[0], store_pos[1], new_discovery['name']))
+            visual_memory.add(entity_key(store_pos[0], store_pos[1], new_discovery['name']))
             
             # ========== STEP 4: Execute Replan (If Needed) ==========
             if decision['should_replan']:
@@ -1365,7 +1737,10 @@ def run_live_dashboard():
                     logger.warning("REPLAN", "Failed to update agent position")
                 
                 # Update PDDL with discovered objects (more reliable than inject_dynamic_state)
-                logger.info("REPLAN", f"Updating PDDL with {len(state_manager.discovered_objects)} discovered objects")
+                logger.info("REPLAN", "Updating PDDL with %d discovered objects", len(state_manager.discovered_objects))
+                if pending_blocked:
+                    patcher.add_blocked_locations(pending_blocked)
+                    pending_blocked.clear()
                 success = patcher.update_problem_file(env.agent_pos, state_manager.discovered_objects)
                 
                 if success:
@@ -1374,7 +1749,7 @@ def run_live_dashboard():
                     
                     try:
                         current_plan = runner.run_planner("domain.pddl", "problem_initial.pddl")
-                        logger.info("REPLAN", f"✓ New plan: {len(current_plan)} actions")
+                        logger.info("REPLAN", "✓ New plan: %d actions", len(current_plan))
                         if current_plan:
                             preview = ' → '.join(current_plan[:8])
                             if len(current_plan) > 8:
@@ -1386,10 +1761,7 @@ def run_live_dashboard():
                                 first_action = current_plan[0]
                                 first_target = get_target_from_action(first_action, translator)
                                 if first_target:
-                                    dx = first_target[0] - env.agent_pos[0]
-                                    dy = first_target[1] - env.agent_pos[1]
-                                    manhattan = abs(dx) + abs(dy)
-                                    if manhattan != 1:
+                                    if not _is_adjacent(env.agent_pos, first_target):
                                         logger.error("REPLAN", f"❌ First replan action invalid! Target {first_target} not adjacent to {env.agent_pos}")
                                     else:
                                         logger.info("REPLAN", f"✅ First replan action validated")
@@ -1426,9 +1798,8 @@ def run_live_dashboard():
                         logger.info("REPLAN", "Buffer cleared, index reset")
                         
                         # Reset failure tracking
-                        if hasattr(translator, 'recent_failures'):
-                            translator.recent_failures = []
-                            logger.debug("REPLAN", "Cleared failure history")
+                        translator.recent_failures.clear()
+                        logger.debug("REPLAN", "Cleared failure history")
                     # Note: If backtrack was initiated (translator.has_actions() is True),
                     # buffer contains backtrack actions - don't clear it, let them execute
                 else:
@@ -1447,8 +1818,9 @@ def run_live_dashboard():
             logger.warning("EXECUTION", "Step index beyond plan length - waiting for replan")
             total_cost += 1
             step += 1
-            if not replan_triggered:
-                time.sleep(0.1)
+            # No sleep here: replanning runs synchronously in this loop, so
+            # there is nothing to wait for - the next iteration's discovery /
+            # watchdog checks are what can produce a new plan
             continue
 
         if not current_plan:
@@ -1464,21 +1836,22 @@ def run_live_dashboard():
 
         # ========== PHASE 2: Get Current PDDL Action ==========
         pddl_action = current_plan[current_step_index]
-        target_pos = get_target_from_action(pddl_action, translator)
+        # The plan step's own target; PHASE 3 may replace target_pos with the
+        # translator's, but the safety checks below compare against this one
+        _, plan_target_pos, plan_store_name = _plan_entries(current_plan, translator)[current_step_index]
+        target_pos = plan_target_pos
         
         # ========== PHASE 3: Populate Action Buffer ==========
         # Only refill buffer if it's empty
         if not translator.has_actions():
             # CRITICAL FIX: Ensure agent_pos is tuple for consistent comparison
-            agent_pos_tuple = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
-            mock_agent = type('MockAgent', (), {
-                'pos': agent_pos_tuple,  # Use tuple, not list
-                'dir': env.agent_dir
-            })()
+            agent_pos_tuple = current_agent_pos_tuple
+            mock_agent.pos = agent_pos_tuple  # Use tuple, not list
+            mock_agent.dir = env.agent_dir
             
             # Log before translation
-            logger.debug("TRANSLATE", f"Translating: {pddl_action}")
-            logger.debug("TRANSLATE", f"Agent state: pos={mock_agent.pos}, dir={mock_agent.dir}")
+            logger.debug("TRANSLATE", "Translating: %s", pddl_action)
+            logger.debug("TRANSLATE", "Agent state: pos=%s, dir=%s", mock_agent.pos, mock_agent.dir)
             
             # CRITICAL FIX: get_micro_action() now populates buffer with ALL actions
             # It returns None for the action (we ignore it) and the target
@@ -1496,23 +1869,23 @@ def run_live_dashboard():
             
             # Log what we're about to execute
             if translator.has_actions():
-                logger.debug("EXECUTION", f"Step {current_step_index}: {pddl_action}")
-                logger.debug("EXECUTION", f"Target: {target_pos}, Buffer: {translator.action_buffer}")
+                # Only format the buffer when debug output actually goes somewhere
+                if logger.is_enabled_for(logging.DEBUG):
+                    logger.debug("EXECUTION", f"Step {current_step_index}: {pddl_action}")
+                    logger.debug("EXECUTION", f"Target: {target_pos}, Buffer: {list(translator.action_buffer)}")
             else:
                 logger.warning("EXECUTION", f"⚠️ No actions in buffer after translation!")
             
             # ========== VALIDATION: Check if plan makes sense ==========
             if target_pos and not translator.has_actions():
-                current_pos_tuple = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
+                current_pos_tuple = current_agent_pos_tuple
                 
                 # Check if target is adjacent
-                dx = target_pos[0] - current_pos_tuple[0]
-                dy = target_pos[1] - current_pos_tuple[1]
-                manhattan = abs(dx) + abs(dy)
-                
-                if manhattan != 1:
+                if not _is_adjacent(current_pos_tuple, target_pos):
+                    dx = target_pos[0] - current_pos_tuple[0]
+                    dy = target_pos[1] - current_pos_tuple[1]
                     logger.error("VALIDATION", f"❌ Plan error: Target {target_pos} not adjacent to {current_pos_tuple}")
-                    logger.error("VALIDATION", f"Manhattan distance: {manhattan}")
+                    logger.error("VALIDATION", f"Squared distance: {dx*dx + dy*dy}")
                     logger.error("VALIDATION", "Forcing emergency replan...")
                     
                     # Run diagnostic
@@ -1527,80 +1900,47 @@ def run_live_dashboard():
 
         # ========== PHASE 4: Execute ONE Motor Action ==========
         if translator.has_actions():
-            motor_action = translator.action_buffer.pop(0)
+            motor_action = translator.action_buffer.popleft()
             
             # Save state BEFORE execution
-            prev_pos = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
+            prev_pos = current_agent_pos_tuple
             prev_dir = env.agent_dir
             
             # CRITICAL DEBUG: Log before action
-            action_names = {0: "TurnLeft", 1: "TurnRight", 2: "Forward", 6: "Done"}
-            logger.debug("MOTOR", f"Executing: {action_names.get(motor_action, motor_action)}")
-            logger.debug("MOTOR", f"Before: pos={prev_pos}, dir={prev_dir}, target={target_pos}")
-            
-            # ========== REALITY CHECK: Log actual movement ==========
-            def log_movement_reality(env, action, pos_before, pos_after):
-                """Log what REALLY happened when action executed."""
-                dx = pos_after[0] - pos_before[0]
-                dy = pos_after[1] - pos_before[1]
-                
-                action_names_map = {0: "TurnLeft", 1: "TurnRight", 2: "Forward", 6: "Done"}
-                
-                logger.info("REALITY", f"{action_names_map.get(action, action)}: {pos_before} → {pos_after}")
-                logger.info("REALITY", f"Delta: dx={dx}, dy={dy}, dir={env.agent_dir}")
-                
-                if action == 2:  # Forward
-                    if dx == 1 and dy == 0:
-                        logger.info("REALITY", f"✅ Agent facing RIGHT (dir={env.agent_dir})")
-                    elif dx == 0 and dy == 1:
-                        logger.info("REALITY", f"⚠️  Agent facing DOWN (dir={env.agent_dir})")
-                    elif dx == -1 and dy == 0:
-                        logger.info("REALITY", f"⚠️  Agent facing LEFT (dir={env.agent_dir})")
-                    elif dx == 0 and dy == -1:
-                        logger.info("REALITY", f"⚠️  Agent facing UP (dir={env.agent_dir})")
+            logger.debug("MOTOR", "Executing: %s", _ACTION_NAMES.get(motor_action, motor_action))
+            logger.debug("MOTOR", "Before: pos=%s, dir=%s, target=%s", prev_pos, prev_dir, target_pos)
             
             # ========== PRE-EXECUTION SAFETY: Target Entry Logic ==========
             # Check if Forward action would hit an obstacle that IS our planned target
             if motor_action == 2:  # Forward action
-                # 1. Identify the Planner's Intended Target for this step
-                planned_target_pos = None
-                if current_plan and current_step_index < len(current_plan):
-                    try:
-                        # Parse action like: "(drive loc_18_17 loc_18_18)" or "drive loc_18_17 loc_18_18"
-                        pddl_action = current_plan[current_step_index]
-                        planned_target_pos = get_target_from_action(pddl_action, translator)
-                    except Exception as e:
-                        logger.debug("SAFETY", f"Failed to parse target from plan: {e}")
+                # 1. The Planner's Intended Target for this step is plan_target_pos (parsed in PHASE 2)
 
                 # 2. Calculate what cell is in front of us
-                fx, fy = env.agent_pos
-                if env.agent_dir == 0: fx += 1  # Right
-                elif env.agent_dir == 1: fy += 1  # Down
-                elif env.agent_dir == 2: fx -= 1  # Left
-                elif env.agent_dir == 3: fy -= 1  # Up
+                dx, dy = _DIR_DELTAS[env.agent_dir]
+                fx, fy = prev_pos[0] + dx, prev_pos[1] + dy
                 
                 front_pos_tuple = (fx, fy)
                 
                 # 3. Check if there's an object at front_pos
-                if 0 <= fx < env.grid.width and 0 <= fy < env.grid.height:
-                    front_cell = env.grid.get(fx, fy)
+                if 0 <= fx < grid_w and 0 <= fy < grid_h:
+                    front_cell = grid_get(fx, fy)
                     
-                    if front_cell and front_cell.type in ['wall', 'obstacle', 'lava', 'ball']:
+                    if front_cell and front_cell.type in _BLOCKING_TYPES:
                         front_type = getattr(front_cell, 'type', 'unknown')
                         
                         # 🚨 THE CRITICAL FIX: TRUST THE PLAN 🚨
                         # If the object in front is EXACTLY where the plan says to go,
                         # we assume it's a target (like the Victory Ball) and allow entry.
-                        if planned_target_pos and front_pos_tuple == planned_target_pos:
-                            logger.info("EXECUTION", f"🎯 Obstacle at {front_pos_tuple} matches Plan Target ({planned_target_pos}) - ALLOWING ENTRY!")
+                        if plan_target_pos and front_pos_tuple == plan_target_pos:
+                            logger.info("EXECUTION", f"🎯 Obstacle at {front_pos_tuple} matches Plan Target ({plan_target_pos}) - ALLOWING ENTRY!")
                             logger.info("EXECUTION", f"   Object type: {front_type} - This is our destination per plan")
                             # Continue with execution - don't block
                 else:
                             # It's an obstacle we didn't plan for (e.g. a new wall)
                             logger.warning("COLLISION", f"🚧 Path blocked by unexpected {front_type} at {front_pos_tuple}")
-                            logger.warning("COLLISION", f"   Plan wanted: {planned_target_pos}, but found obstacle at {front_pos_tuple}")
+                            logger.warning("COLLISION", f"   Plan wanted: {plan_target_pos}, but found obstacle at {front_pos_tuple}")
                             # Mark as blocked and trigger replan (existing logic will handle this)
-                            patcher.add_blocked_location(front_pos_tuple)
+                            pending_blocked.add(front_pos_tuple)
                             translator.clear_buffer()
                             current_step_index = 0
                             replan_triggered = True
@@ -1609,24 +1949,8 @@ def run_live_dashboard():
                             continue  # Skip execution, trigger replan
             
             # Execute physical action
-            # Store planned_target_pos for physics override check
-            planned_target_pos_for_override = None
-            if current_plan and current_step_index < len(current_plan):
-                try:
-                    pddl_action_for_override = current_plan[current_step_index]
-                    planned_target_pos_for_override = get_target_from_action(pddl_action_for_override, translator)
-                except Exception:
-                    pass
-            
             if motor_action != 6:  # Not done action
-                step_result = env.step(motor_action)
-                
-                # Handle both gymnasium (5 values) and older gym (4 values) formats
-                if len(step_result) == 5:
-                    obs, reward, terminated, truncated, info = step_result
-                    done = terminated or truncated
-                else:
-                    obs, reward, done, info = step_result
+                obs, reward, done, info = env_step(motor_action)
             else:
                 # Motor action is 6 (Done) - no environment step needed
                 done = False  # Keep running unless we've achieved victory
@@ -1635,16 +1959,12 @@ def run_live_dashboard():
 
             # ========== PHYSICS OVERRIDE FOR VICTORY/GOAL ENTRY ==========
             # If we tried to move Forward (2) into the planned target, but physics blocked us:
-            if motor_action == 2 and planned_target_pos_for_override:
+            if motor_action == 2 and plan_target_pos:
                     # Check if position didn't change (physics blocked us)
-                    temp_curr_pos = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
+                    temp_curr_pos = _pt(env.agent_pos)
                     if temp_curr_pos == prev_pos:
                         # Calculate where we wanted to go
-                        dx, dy = (0, 0)
-                        if env.agent_dir == 0: dx = 1  # Right
-                        elif env.agent_dir == 1: dy = 1  # Down
-                        elif env.agent_dir == 2: dx = -1  # Left
-                        elif env.agent_dir == 3: dy = -1  # Up
+                        dx, dy = _DIR_DELTAS[env.agent_dir]
                         
                         intended_pos = (prev_pos[0] + dx, prev_pos[1] + dy)
                         
@@ -1656,15 +1976,12 @@ def run_live_dashboard():
                         
                         # Check if it's a discovered store we're planning to visit
                         # (Only stores we decided to visit are in discovered_objects)
-                        for obj_name, obj_data in state_manager.discovered_objects.items():
-                            if obj_data.get('type') == 'store' and 'pos' in obj_data:
-                                if tuple(obj_data['pos']) == intended_pos:
-                                    # This is a store we discovered and decided to visit (replan)
-                                    is_allowed_store = True
-                                    break
+                        if intended_pos in state_manager.store_positions:
+                            # This is a store we discovered and decided to visit (replan)
+                            is_allowed_store = True
                         
                         # Only force entry if it's victory store OR an allowed store
-                        if intended_pos == planned_target_pos_for_override and (is_victory_store or is_allowed_store):
+                        if intended_pos == plan_target_pos and (is_victory_store or is_allowed_store):
                             store_type = 'Victory Store' if is_victory_store else 'Allowed Store'
                             logger.info("PHYSICS", f"🛡️ Forcing physical entry onto {store_type} at {intended_pos}")
                             # Manually set agent position (teleport on top of ball/victory)
@@ -1673,41 +1990,40 @@ def run_live_dashboard():
                             else:
                                 env.agent_pos = list(intended_pos) if isinstance(env.agent_pos, list) else intended_pos
                             logger.info("PHYSICS", f"✅ Agent position manually set to {env.agent_pos}")
-                        elif intended_pos == planned_target_pos_for_override:
+                        elif intended_pos == plan_target_pos:
                             # This is a store we're NOT allowed to enter - treat as blocked
                             logger.warning("PHYSICS", f"🚫 Blocked: Cannot enter store at {intended_pos} (not victory and not in allowed stores)")
                             # Don't force entry - let physics handle it (will trigger replan)
             
             # Save state AFTER execution (and potential physics override)
-            curr_pos = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
+            curr_pos = _pt(env.agent_pos)
             curr_dir = env.agent_dir
             
             pos_changed = (curr_pos != prev_pos)
             dir_changed = (curr_dir != prev_dir)
             
             # CRITICAL DEBUG: Log after action
-            logger.debug("MOTOR", f"After: pos={curr_pos}, dir={curr_dir}, pos_changed={pos_changed}, dir_changed={dir_changed}")
+            logger.debug("MOTOR", "After: pos=%s, dir=%s, pos_changed=%s, dir_changed=%s", curr_pos, curr_dir, pos_changed, dir_changed)
             
             # ========== REALITY CHECK: Log actual movement result ==========
             # Log ALL actions (including turns where pos doesn't change)
             if motor_action != 6:
                 if prev_pos != curr_pos:
-                    log_movement_reality(env, motor_action, prev_pos, curr_pos)
-                elif motor_action in [0, 1]:  # Turn actions
-                    logger.info("REALITY", f"Turn {'Left' if motor_action == 0 else 'Right'}: dir {prev_dir} → {curr_dir}")
-                    logger.info("REALITY", f"Position unchanged: {curr_pos} (expected for turn)")
+                    log_movement_reality(env.agent_dir, motor_action, prev_pos, curr_pos)
+                elif motor_action in _TURN_ACTIONS:  # Turn actions
+                    logger.info("REALITY", "Turn %s: dir %s → %s", 'Left' if motor_action == 0 else 'Right', prev_dir, curr_dir)
+                    logger.info("REALITY", "Position unchanged: %s (expected for turn)", curr_pos)
 
             # ========== ADD DEBUG LOGGING ==========
-            action_names = {0: "TurnLeft", 1: "TurnRight", 2: "Forward", 6: "Done"}
             if step % 10 == 0 or pos_changed or dir_changed:  # Log every 10 steps or when state changes
-                logger.debug("MOTOR", f"Action: {action_names.get(motor_action, motor_action)}")
-                logger.debug("MOTOR", f"Position: {prev_pos} → {curr_pos} (changed={pos_changed})")
-                logger.debug("MOTOR", f"Direction: {prev_dir} → {curr_dir} (changed={dir_changed})")
+                logger.debug("MOTOR", "Action: %s", _ACTION_NAMES.get(motor_action, motor_action))
+                logger.debug("MOTOR", "Position: %s → %s (changed=%s)", prev_pos, curr_pos, pos_changed)
+                logger.debug("MOTOR", "Direction: %s → %s (changed=%s)", prev_dir, curr_dir, dir_changed)
             # ============================================
 
             # ========== PHASE 5: Continuous PDDL Sync ==========
             if pos_changed:
-                logger.debug("SYNC", f"✓ Position changed: {prev_pos} → {curr_pos}")
+                logger.debug("SYNC", "✓ Position changed: %s → %s", prev_pos, curr_pos)
                 state_manager.update_agent_pos(env.agent_pos)
                 success = patcher.update_agent_position(env.agent_pos)
                 if success:
@@ -1726,111 +2042,15 @@ def run_live_dashboard():
                 
                 # --- CASE 1: No Target (Special Actions like BUY) ---
                 if target_pos is None:
-                    logger.debug("EXECUTION", f"⚠️ No position target for: {pddl_action}")
+                    logger.debug("EXECUTION", "⚠️ No position target for: %s", pddl_action)
                     
                     # Handle BUY ACTIONS - they have target_pos=None
-                    if "buy milk" in pddl_action.lower():
-                        parts = pddl_action.replace('(', '').replace(')', '').split()
-                        if len(parts) >= 3:
-                            store_name = parts[2]
-                            logger.info("BUY_ACTION", f"💳 Executing buy action for {store_name} at {curr_pos}")
-                            
-                            # CRITICAL FIX: Actually execute the purchase!
-                            # Execute Toggle action (5) to buy milk
-                            step_result = env.step(5)
-                            
-                            # Handle both gymnasium (5 values) and older gym (4 values) formats
-                            if len(step_result) == 5:
-                                obs, reward, terminated, truncated, info = step_result
-                                done_env = terminated or truncated
-                            else:
-                                obs, reward, done_env, info = step_result
-                            
-                            # Check if purchase was successful
-                            if done_env or reward > 0:
-                                # Try to determine price paid
-                                price_paid = 4.0  # Default
-                                for obj_name, obj_data in state_manager.discovered_objects.items():
-                                    if obj_name == store_name and 'properties' in obj_data:
-                                        if 'price' in obj_data['properties']:
-                                            price_paid = obj_data['properties']['price']
-                                            break
-
-                                # Fallback: use the cell's stored price if available
-                                cell = env.grid.get(curr_pos[0], curr_pos[1])
-                                if price_paid == 4.0 and cell is not None and hasattr(cell, 'price'):
-                                    try:
-                                        price_paid = float(cell.price)
-                                    except Exception:
-                                        pass
-
-                                # Final fallback: use scenario surprise object price by position
-                                if price_paid == 4.0 and surprise_obj:
-                                    try:
-                                        if tuple(surprise_obj.get('position', ())) == curr_pos:
-                                            true_price = surprise_obj.get('true_price')
-                                            if true_price is not None:
-                                                price_paid = float(true_price)
-                                    except Exception:
-                                        pass
-                                
-                                # Prefer the scenario true price for the surprise store
-                                if surprise_obj and store_name == surprise_obj.get('name'):
-                                    try:
-                                        true_price = surprise_obj.get('true_price')
-                                        if true_price is not None:
-                                            price_paid = float(true_price)
-                                    except Exception:
-                                        pass
-
-                                logger.info("BUY_ACTION", f"✅ Successfully bought milk at {store_name}! Price: ${price_paid:.2f}")
-                                victory_achieved = True
-                                final_price_paid = price_paid
-                                done = True  # Exit main loop
-                            else:
-                                # Verify store sells milk (from PDDL) as fallback check
-                                try:
-                                    with open("problem_initial.pddl", "r") as f:
-                                        pddl_content = f.read()
-                                        if f"(selling {store_name} milk)" in pddl_content:
-                                            logger.warning("BUY_ACTION", f"⚠️ Toggle executed but no reward - assuming purchase succeeded (PDDL confirms store sells milk)")
-                                            # Resolve price even without reward
-                                            price_paid = 4.0
-                                            for obj_name, obj_data in state_manager.discovered_objects.items():
-                                                if obj_name == store_name and 'properties' in obj_data:
-                                                    if 'price' in obj_data['properties']:
-                                                        price_paid = obj_data['properties']['price']
-                                                        break
-                                            cell = env.grid.get(curr_pos[0], curr_pos[1])
-                                            if price_paid == 4.0 and cell is not None and hasattr(cell, 'price'):
-                                                try:
-                                                    price_paid = float(cell.price)
-                                                except Exception:
-                                                    pass
-                                            if price_paid == 4.0 and surprise_obj:
-                                                try:
-                                                    if tuple(surprise_obj.get('position', ())) == curr_pos:
-                                                        true_price = surprise_obj.get('true_price')
-                                                        if true_price is not None:
-                                                            price_paid = float(true_price)
-                                                except Exception:
-                                                    pass
-                                            # Prefer the scenario true price for the surprise store
-                                            if surprise_obj and store_name == surprise_obj.get('name'):
-                                                try:
-                                                    true_price = surprise_obj.get('true_price')
-                                                    if true_price is not None:
-                                                        price_paid = float(true_price)
-                                                except Exception:
-                                                    pass
-
-                                            victory_achieved = True
-                                            final_price_paid = price_paid
-                                            done = True  # Exit main loop
-                                        else:
-                                            logger.warning("BUY_ACTION", f"⚠️ Purchase failed - {store_name} doesn't sell milk in PDDL!")
-                                except Exception as e:
-                                    logger.error("EXECUTION", f"Error reading PDDL: {e}")
+                    if plan_store_name:
+                        price_paid = _execute_buy(plan_store_name, curr_pos, env, env_step, state_manager, surprise_obj)
+                        if price_paid is not None:
+                            victory_achieved = True
+                            final_price_paid = price_paid
+                            done = True  # Exit main loop
                     else:
                         logger.info("EXECUTION", f"Advancing index anyway (special action)")
                     
@@ -1840,7 +2060,7 @@ def run_live_dashboard():
                 
                 # --- CASE 2: AT TARGET (Success!) ---
                 elif curr_pos == target_pos:
-                    logger.info("EXECUTION", f"✅ VERIFIED ARRIVAL at {curr_pos} (Step {current_step_index})")
+                    logger.info("EXECUTION", "✅ VERIFIED ARRIVAL at %s (Step %d)", curr_pos, current_step_index)
                     
                     # ✅ Advance to next PDDL step
                     current_step_index += 1
@@ -1883,9 +2103,9 @@ def run_live_dashboard():
                     # This can happen in two scenarios:
                     
                     # SCENARIO A: Just completed a Turn action
-                    if last_action in [0, 1]:  # Turn Left (0) or Turn Right (1)
-                        logger.debug("EXECUTION", f"↻ Turn completed at {curr_pos} (dir: {prev_dir}→{curr_dir})")
-                        logger.debug("EXECUTION", f"Staying on Step {current_step_index}, will populate buffer next iteration")
+                    if last_action in _TURN_ACTIONS:  # Turn Left (0) or Turn Right (1)
+                        logger.debug("EXECUTION", "↻ Turn completed at %s (dir: %s→%s)", curr_pos, prev_dir, curr_dir)
+                        logger.debug("EXECUTION", "Staying on Step %s, will populate buffer next iteration", current_step_index)
                         # ✅ THIS IS NORMAL - stay on same step, loop continues
                         # Next iteration will populate buffer with Forward action
                     
@@ -1901,7 +2121,7 @@ def run_live_dashboard():
                             logger.info("COLLISION", f"Plan delta: ({dx_plan}, {dy_plan})")
                             
                             # Check if this is a backward movement issue
-                            if abs(dx_plan) + abs(dy_plan) != 1:
+                            if (dx_plan, dy_plan) not in _UNIT_STEPS:
                                 logger.error("COLLISION", "⚠️ PLAN BUG: Target not adjacent!")
                                 logger.error("COLLISION", "This is a PDDL connectivity issue")
                                 diagnose_pddl_plan_issue(curr_pos, target_pos, current_plan)
@@ -1918,12 +2138,12 @@ def run_live_dashboard():
                                     
                                     # Validate it's a 2D coordinate
                                     if isinstance(front_pos_tuple, tuple) and len(front_pos_tuple) == 2:
-                                        front_cell = env.grid.get(*front_pos_tuple)
+                                        front_cell = grid_get(*front_pos_tuple)
                                         
                                         if front_cell:
                                             front_type = getattr(front_cell, 'type', 'unknown')
                                             logger.info("COLLISION", f"Blocked by '{front_type}' at {front_pos_tuple}")
-                                            patcher.add_blocked_location(front_pos_tuple)
+                                            pending_blocked.add(front_pos_tuple)
                                             
                                             # CRITICAL: Mark the CURRENT position as having a blocked neighbor
                                             # This helps the planner understand the topology
@@ -1956,121 +2176,23 @@ def run_live_dashboard():
             # No actions in buffer - this happens for buy actions
             # We need to check if this is a buy action and execute it
             if current_plan and current_step_index < len(current_plan):
-                pddl_action = current_plan[current_step_index]
-                
-                # Get target position for this action
-                target_pos = get_target_from_action(pddl_action, translator)
+                # Target position and buy store of this action
+                _, target_pos, store_name = _plan_entries(current_plan, translator)[current_step_index]
                 
                 # Save current state
-                curr_pos = tuple(env.agent_pos) if isinstance(env.agent_pos, (list, tuple, np.ndarray)) else env.agent_pos
+                curr_pos = _pt(env.agent_pos)
                 
                 # Check if this is a buy action (target_pos is None for buy actions)
-                if target_pos is None and "buy milk" in pddl_action.lower():
-                    parts = pddl_action.replace('(', '').replace(')', '').split()
-                    if len(parts) >= 3:
-                        store_name = parts[2]
-                        logger.info("BUY_ACTION", f"💳 Executing buy action for {store_name} at {curr_pos}")
-                        
-                        # CRITICAL FIX: Actually execute the purchase!
-                        # Execute Toggle action (5) to buy milk
-                        step_result = env.step(5)
-                        
-                        # Handle both gymnasium (5 values) and older gym (4 values) formats
-                        if len(step_result) == 5:
-                            obs, reward, terminated, truncated, info = step_result
-                            done_env = terminated or truncated
-                        else:
-                            obs, reward, done_env, info = step_result
-                        
-                        # Check if purchase was successful
-                        if done_env or reward > 0:
-                            # Try to determine price paid
-                            price_paid = 4.0  # Default
-                            for obj_name, obj_data in state_manager.discovered_objects.items():
-                                if obj_name == store_name and 'properties' in obj_data:
-                                    if 'price' in obj_data['properties']:
-                                        price_paid = obj_data['properties']['price']
-                                        break
-
-                            # Fallback: use the cell's stored price if available
-                            cell = env.grid.get(curr_pos[0], curr_pos[1])
-                            if price_paid == 4.0 and cell is not None and hasattr(cell, 'price'):
-                                try:
-                                    price_paid = float(cell.price)
-                                except Exception:
-                                    pass
-
-                            # Final fallback: use scenario surprise object price by position
-                            if price_paid == 4.0 and surprise_obj:
-                                try:
-                                    if tuple(surprise_obj.get('position', ())) == curr_pos:
-                                        true_price = surprise_obj.get('true_price')
-                                        if true_price is not None:
-                                            price_paid = float(true_price)
-                                except Exception:
-                                    pass
-                            
-                            # Prefer the scenario true price for the surprise store
-                            if surprise_obj and store_name == surprise_obj.get('name'):
-                                try:
-                                    true_price = surprise_obj.get('true_price')
-                                    if true_price is not None:
-                                        price_paid = float(true_price)
-                                except Exception:
-                                    pass
-
-                            logger.info("BUY_ACTION", f"✅ Successfully bought milk at {store_name}! Price: ${price_paid:.2f}")
-                            victory_achieved = True
-                            final_price_paid = price_paid
-                            done = True  # Exit main loop
-                        else:
-                            # Verify store sells milk (from PDDL) as fallback check
-                            try:
-                                with open("problem_initial.pddl", "r") as f:
-                                    pddl_content = f.read()
-                                    if f"(selling {store_name} milk)" in pddl_content:
-                                        logger.warning("BUY_ACTION", f"⚠️ Toggle executed but no reward - assuming purchase succeeded (PDDL confirms store sells milk)")
-                                        # Resolve price even without reward
-                                        price_paid = 4.0
-                                        for obj_name, obj_data in state_manager.discovered_objects.items():
-                                            if obj_name == store_name and 'properties' in obj_data:
-                                                if 'price' in obj_data['properties']:
-                                                    price_paid = obj_data['properties']['price']
-                                                    break
-                                        cell = env.grid.get(curr_pos[0], curr_pos[1])
-                                        if price_paid == 4.0 and cell is not None and hasattr(cell, 'price'):
-                                            try:
-                                                price_paid = float(cell.price)
-                                            except Exception:
-                                                pass
-                                        if price_paid == 4.0 and surprise_obj:
-                                            try:
-                                                if tuple(surprise_obj.get('position', ())) == curr_pos:
-                                                    true_price = surprise_obj.get('true_price')
-                                                    if true_price is not None:
-                                                        price_paid = float(true_price)
-                                            except Exception:
-                                                pass
-                                        # Prefer the scenario true price for the surprise store
-                                        if surprise_obj and store_name == surprise_obj.get('name'):
-                                            try:
-                                                true_price = surprise_obj.get('true_price')
-                                                if true_price is not None:
-                                                    price_paid = float(true_price)
-                                            except Exception:
-                                                pass
-
-                                        victory_achieved = True
-                                        final_price_paid = price_paid
-                                        done = True  # Exit main loop
-                                    else:
-                                        logger.warning("BUY_ACTION", f"⚠️ Purchase failed - {store_name} doesn't sell milk in PDDL!")
-                            except Exception as e:
-                                logger.error("EXECUTION", f"Error reading PDDL: {e}")
-                        
-                        # Advance to next PDDL step
-                        current_step_index += 1
-                        translator.clear_buffer()
+                if target_pos is None and store_name:
+                    price_paid = _execute_buy(store_name, curr_pos, env, env_step, state_manager, surprise_obj)
+                    if price_paid is not None:
+                        victory_achieved = True
+                        final_price_paid = price_paid
+                        done = True  # Exit main loop
+                    
+                    # Advance to next PDDL step
+                    current_step_index += 1
+                    translator.clear_buffer()
 
         # ========== PHASE 7: Handle Replan Trigger ==========
         if replan_triggered:
@@ -2081,6 +2203,9 @@ def run_live_dashboard():
             
             # Step 2: Update PDDL with new state using the ROBUST method
             # CRITICAL FIX: Use the smart update method ensuring types and predicates
+            if pending_blocked:
+                patcher.add_blocked_locations(pending_blocked)
+                pending_blocked.clear()
             success = patcher.update_problem_file(env.agent_pos, state_manager.discovered_objects)
             
             if success:
@@ -2089,7 +2214,7 @@ def run_live_dashboard():
                 # Step 3: Run planner
                 try:
                     current_plan = runner.run_planner("domain.pddl", "problem_initial.pddl")
-                    logger.info("REPLAN", f"✓ New plan generated: {len(current_plan)} actions")
+                    logger.info("REPLAN", "✓ New plan generated: %d actions", len(current_plan))
                 except RuntimeError as e:
                     logger.error("REPLAN", f"❌ Planner failed: {e}")
                     
@@ -2115,8 +2240,7 @@ def run_live_dashboard():
                 current_step_index = 0
                 
                 # Step 5: Reset tracking
-                if hasattr(translator, 'recent_failures'):
-                    translator.recent_failures = []
+                translator.recent_failures.clear()
             else:
                 logger.error("REPLAN", "❌ Failed to update PDDL - continuing with stale plan")
             
@@ -2133,9 +2257,8 @@ def run_live_dashboard():
             break
 
         # Reduced performance logging - only log every 10 steps
-        step_end_time = time.time()
-        if step % 10 == 0:
-            logger.debug("PERFORMANCE", f"Step {step} duration: {step_end_time - step_start_time:.3f}s")
+        if log_step_times and step % 10 == 0:
+            logger.debug("PERFORMANCE", "Step %d duration: %.3fs", step, time.time() - step_start_time)
 
     # EXPERIMENT RESULTS & LOGGING
     logger.info("EXPERIMENT", "=== EXPERIMENT COMPLETED ===")
@@ -2169,8 +2292,10 @@ def run_live_dashboard():
         llm_calls_count=llm_calls_count,
         true_final_price=true_final_price,
         victory_reached=victory_reached,
-        termination_reason="completed"
+        termination_reason="completed",
+        replan_events=replan_events
     )
+    results_logger.flush()
 
     logger.info("LOGGING", "Results saved to experiment_results.csv")
 
@@ -2182,6 +2307,31 @@ def run_live_dashboard():
 
     print(f"Comparative Experiment Completed: Algorithm {ALGORITHM_MODE} on {SCENARIO_ID}")
     print(f"Results logged to experiment_results.csv")
+    return True
+
+def run(seed, algorithm, scenario):
+    """
+    Run one experiment in-process, for worker pools that reuse the interpreter.
+
+    Sets the same environment variables the script reads when launched on its
+    own, runs the dashboard in the current working directory and returns an
+    exit code: 0 if the experiment completed, 1 if it exited early (e.g. no
+    initial plan), the sys.exit() code otherwise.
+    """
+    os.environ['USE_FIXED_SEED'] = 'true'  # Use fixed seed for reproducibility
+    os.environ['SEED'] = str(seed)
+    os.environ['ALGORITHM_MODE'] = algorithm
+    os.environ['SCENARIO_ID'] = scenario
+    try:
+        return 0 if run_live_dashboard() else 1
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    finally:
+        # Figures would otherwise accumulate across runs in the same process, and
+        # the results file handle must not outlive this run's working directory
+        plt.close('all')
+        results_logger.close()
+
 
 if __name__ == "__main__":
     run_live_dashboard()
\ No newline at end of file
@@ -14,9 +14,9 @@ from minigrid.core.world_object import Ball, Wall
 
 from custom_env import RandomizedMazeEnv
 from llm_reasoner import LLMReasoner
-from simulation_engine import FastDownwardRunner, StateTranslator, detect_new_entities  # Reuse policy compliance
+from simulation_engine import FastDownwardRunner, StateTranslator, detect_new_entities, entity_key  # Reuse policy compliance
 from state_manager import StateManager
-from pddl_patcher import PDDLPatcher
+from pddl_patcher import PDDLPatcher, grid_locations_str
 from utils.logger import setup_logger
 
 
@@ -219,11 +219,7 @@ def run_experiment(scenario_id: str, algorithm: str) -> Dict:
     victory_loc = f"loc_{victory_pos[0]}_{victory_pos[1]}"
     
     # Generate all grid locations
-    all_locations = []
-    for x in range(env.width):
-        for y in range(env.height):
-            all_locations.append(f"loc_{x}_{y}")
-    locations_str = " ".join(all_locations)
+    locations_str = grid_locations_str(env.width, env.height)
     
     # Create fresh problem_initial.pddl
     with open("problem_initial.pddl", "w") as f:
@@ -323,7 +319,7 @@ def run_experiment(scenario_id: str, algorithm: str) -> Dict:
 
         # Execute one motor action or handle buy
         if translator.has_actions():
-            motor_action = translator.action_buffer.pop(0)
+            motor_action = translator.action_buffer.popleft()
             result = env.step(motor_action)
             if len(result) == 5:
                 obs, reward, terminated, truncated, info = result
@@ -350,7 +346,7 @@ def run_experiment(scenario_id: str, algorithm: str) -> Dict:
         # Detection of new entities
         new_entity = detect_new_entities(None, ["victory"], env, visual_memory=visual_memory)
         if new_entity:
-            visual_memory.add((new_entity["position"][0], new_entity["position"][1], new_entity["name"]))
+            visual_memory.add(entity_key(new_entity["position"][0], new_entity["position"][1], new_entity["name"]))
             logger.info("DISCOVERY", f"Found {new_entity['name']} at {new_entity['position']}")
 
             # Algorithm-specific decision
@@ -3,9 +3,11 @@
 Run single algorithm on all scenarios for external review
 """
 
+import multiprocessing
 import os
-import subprocess
-import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from run_comparative_experiment import MAX_WORKERS, _init_worker, _merge_results, run_single_experiment
 
 def run_algorithm(algorithm, scenarios):
     """Run single algorithm on all scenarios"""
@@ -22,42 +24,38 @@ def run_algorithm(algorithm, scenarios):
         'SCENARIO_5': 56789
     }
 
-    for scenario in scenarios:
-        seed = seeds[scenario]
-
-        print(f"🎯 תרחיש {scenario} (Seed: {seed})")
-        print("-" * 30)
-
-        # Set environment variables
-        env = os.environ.copy()
-        env['ALGORITHM_MODE'] = algorithm
-        env['SCENARIO_ID'] = scenario
-        env['SEED'] = str(seed)
-        env.setdefault('SCENARIO_ONLY', 'true')
-        env.setdefault('USE_FIXED_SEED', 'true')
-
-        # Run simulation
-        try:
-            result = subprocess.run(
-                ['python', 'run_live_dashboard.py'],
-                env=env,
-                capture_output=True,
-                text=True,
-                timeout=180  # 180 seconds timeout for LLM-based runs
-            )
-
-            # Check if completed successfully
-            if "EXPERIMENT COMPLETED" in result.stdout:
-                print("✅ הושלם בהצלחה")
-            else:
-                print("⚠️ הושלם עם אזהרות")
-
-        except subprocess.TimeoutExpired:
-            print("⏰ נתקע - timeout")
-        except Exception as e:
-            print(f"❌ שגיאה: {e}")
-
-        print()
+    # Scenarios are independent, so run them in parallel, each in its own
+    # working directory (same worker setup as run_comparative_experiment.py)
+    os.environ.setdefault('SCENARIO_ONLY', 'true')  # Inherited by the spawned workers
+    os.environ['OMP_NUM_THREADS'] = '1'  # Avoid oversubscription with parallel runs
+    os.environ.setdefault('MPLBACKEND', 'Agg')  # No interactive windows from parallel runs
+    with ProcessPoolExecutor(max_workers=min(len(scenarios), MAX_WORKERS),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(run_single_experiment, seeds[scenario], algorithm, scenario, timeout=180): scenario  # 180 s, as before, for LLM-based runs
+            for scenario in scenarios
+        }
+        for future in as_completed(futures):
+            scenario = futures[future]
+            print(f"🎯 תרחיש {scenario} (Seed: {seeds[scenario]})")
+            print("-" * 30)
+
+            try:
+                success, run_dir = future.result()
+                # Results are collected into the shared CSV as each run finishes
+                _merge_results(run_dir)
+
+                # Check if completed successfully
+                if success:
+                    print("✅ הושלם בהצלחה")
+                else:
+                    print(f"⚠️ הושלם עם אזהרות ({os.path.join(run_dir, 'run.log')})")
+
+            except Exception as e:
+                print(f"❌ שגיאה: {e}")
+
+            print()
 
 def show_results():
     """Show current results"""
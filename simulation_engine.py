@@ -3,19 +3,97 @@ Simulation Engine - Core PDDL Planning and Translation Logic
 Handles FastDownward integration, state translation, and entity detection.
 """
 
+import hashlib
 import subprocess
 import os
 import re
+import sys
+import time
+from collections import OrderedDict, deque
 from typing import List, Tuple, Dict, Optional, Set
 import numpy as np
 from minigrid.core.world_object import Wall
 
+# The single agent-position fact of a problem file
+_AT_AGENT_RE = re.compile(r'\(at_agent agent (loc_\d+_\d+)\)')
+# str.translate table that strips the parentheses around a PDDL action
+_PAREN_TRANS = str.maketrans('', '', '()')
+# Translator output file the Fast Downward driver reads and writes by default
+_SAS_FILE = "output.sas"
+
+
+def _lru_get(cache, key):
+    """Look up key in an OrderedDict LRU cache, marking it most recently used."""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, maxsize):
+    """Insert into an OrderedDict LRU cache, evicting the least recently used entries."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+def _index_sas_agent_var(sas_text):
+    """
+    Locate the agent-position variable in translator output.
+
+    Returns (lines, state_line, values) where lines is the SAS file split into
+    lines, state_line the index of that variable's initial value in the
+    begin_state block and values maps loc_x_y -> value index. Returns None if
+    the task has no such variable.
+    """
+    lines = sas_text.split("\n")
+    var_index = -1
+    agent_var = None
+    values = {}
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line == "begin_variable":
+            var_index += 1
+            # name, axiom layer, range, then one line per value
+            value_count = int(lines[i + 3])
+            first_value = i + 4
+            for v in range(value_count):
+                value = lines[first_value + v]
+                if value.startswith("Atom at_agent(agent, "):
+                    agent_var = var_index
+                    values[value[len("Atom at_agent(agent, "):-1]] = v
+            i = first_value + value_count
+        elif line == "begin_state":
+            if agent_var is None:
+                return None
+            return lines, i + 1 + agent_var, values
+        i += 1
+    return None
+
 
 class FastDownwardRunner:
     """
     Runs Fast Downward planner on PDDL domain and problem files.
     """
 
+    # Plans keyed by a digest of the exact domain + problem text: the planner
+    # is deterministic, so an identical problem (common in stuck/backtrack
+    # loops, and across algorithms run on the same maze in one worker
+    # process) can skip the Fast Downward run entirely. Shared by all runners
+    # in the process, since the key covers everything the plan depends on.
+    _plan_cache = OrderedDict()
+    # Translator output keyed by a digest of domain + problem with the agent
+    # position left out. Replans mostly differ only in where the agent
+    # stands, which in the SAS+ task is just the initial value of one
+    # variable - so translate once and patch that value instead
+    _sas_cache = OrderedDict()
+    # Both caches are LRU-bounded: pool workers live for a whole sweep, and
+    # every discovery produces a new problem (a SAS entry holds the whole task)
+    PLAN_CACHE_SIZE = 64
+    SAS_CACHE_SIZE = 16
+
     def __init__(self, fd_path=None, env=None):
         if fd_path is None:
             # Try to find the Fast Downward executable
@@ -66,6 +144,7 @@ class FastDownwardRunner:
         print("\n" + "="*70)
         print("--- DEBUG: DUMPING domain.pddl ---")
         print("="*70)
+        domain_content = problem_content = None
         try:
             with open(domain_file, 'r') as f:
                 domain_content = f.read()
@@ -85,17 +164,25 @@ class FastDownwardRunner:
         
         print("="*70 + "\n")
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=30  # 30 second timeout
-        )
-
-        if result.returncode != 0:
-            error_msg = f"Fast Downward failed with exit code {result.returncode}"
-            print(f"❌ {error_msg}")
-            raise RuntimeError(f"{error_msg}: {result.stderr}")
+        cache_key = None
+        if domain_content is not None and problem_content is not None:
+            cache_key = hashlib.blake2b(
+                f"{domain_content}\0{problem_content}".encode(), digest_size=16
+            ).digest()
+            cached_plan = _lru_get(self._plan_cache, cache_key)
+            if cached_plan is not None:
+                print(f"♻️ Reusing cached plan for identical problem ({len(cached_plan)} actions)")
+                return list(cached_plan)
+
+        # One 30 second budget per replan, shared by translate and search
+        deadline = time.monotonic() + 30
+        search_cmd = None
+        if cache_key is not None:
+            search_cmd = self._prepare_sas_file(domain_file, problem_file, domain_content, problem_content, deadline)
+        if search_cmd is not None:
+            self._run_fast_downward(search_cmd, deadline - time.monotonic())
+        else:
+            self._run_fast_downward(cmd, deadline - time.monotonic())
 
         # Check if sas_plan file was created
         if not os.path.exists("sas_plan"):
@@ -126,8 +213,73 @@ class FastDownwardRunner:
         #     os.remove("sas_plan")
 
         print(f"✅ Fast Downward found plan with {len(plan_actions)} actions")
+        if cache_key is not None:
+            _lru_put(self._plan_cache, cache_key, tuple(plan_actions), self.PLAN_CACHE_SIZE)
         return plan_actions
 
+    def _prepare_sas_file(self, domain_file, problem_file, domain_content, problem_content, deadline):
+        """
+        Write the translated task for this problem to output.sas.
+
+        Runs the translator only when no cached translation of the same
+        problem (up to the agent position) exists; otherwise patches the agent
+        variable's initial value in the cached one. A translator run counts
+        against the replan's ``deadline`` (a time.monotonic() value).
+
+        Returns:
+            The search-only command to run, or None if the problem doesn't
+            have exactly one agent position (the caller then runs the full
+            planner)
+        """
+        agent_locs = _AT_AGENT_RE.findall(problem_content)
+        if len(agent_locs) != 1:
+            return None
+        agent_loc = agent_locs[0]
+        sas_key = hashlib.blake2b(
+            f"{domain_content}\0{_AT_AGENT_RE.sub('', problem_content)}".encode(), digest_size=16
+        ).digest()
+
+        entry = _lru_get(self._sas_cache, sas_key)
+        if entry is not None and agent_loc in entry[2]:
+            lines, state_line, values = entry
+            lines[state_line] = str(values[agent_loc])
+            with open(_SAS_FILE, 'w') as f:
+                f.write("\n".join(lines))
+            print(f"♻️ Reusing cached translation with agent at {agent_loc}")
+        else:
+            translate_cmd = [self.fd_path, "--translate", domain_file, problem_file]
+            print(f"🔍 Translating: {' '.join(translate_cmd)}")
+            self._run_fast_downward(translate_cmd, deadline - time.monotonic())
+            with open(_SAS_FILE, 'r') as f:
+                entry = _index_sas_agent_var(f.read())
+            if entry is not None:
+                _lru_put(self._sas_cache, sas_key, entry, self.SAS_CACHE_SIZE)
+
+        return [self.fd_path, _SAS_FILE, "--search", "astar(lmcut())"]
+
+    def _run_fast_downward(self, cmd, timeout):
+        """
+        Run one Fast Downward driver command, raising RuntimeError on failure.
+
+        The command is killed (subprocess.TimeoutExpired) after ``timeout``
+        seconds; a budget already used up expires it straight away.
+        """
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            # Our fds are non-inheritable (PEP 446) anyway; keeping close_fds off
+            # lets subprocess launch the planner with posix_spawn instead of fork+exec
+            close_fds=False,
+            timeout=max(timeout, 0)
+        )
+
+        if result.returncode != 0:
+            error_msg = f"Fast Downward failed with exit code {result.returncode}"
+            print(f"❌ {error_msg}")
+            # Output is captured as bytes; only the tail of stderr is worth decoding
+            stderr_tail = result.stderr[-4096:].decode('utf-8', 'replace')
+            raise RuntimeError(f"{error_msg}: {stderr_tail}")
+
     def _parse_blocked_locations(self, problem_file: str) -> set:
         """Parse blocked locations from PDDL problem file."""
         blocked = set()
@@ -329,12 +481,32 @@ class StateTranslator:
     Translates between MiniGrid coordinates and PDDL location names.
     """
 
+    # Map movement delta to MiniGrid direction
+    # MiniGrid convention:
+    # 0 = Right (+1, 0)
+    # 1 = Down  (0, +1)
+    # 2 = Left  (-1, 0)
+    # 3 = Up    (0, -1)
+    direction_map = {
+        (1, 0): 0,   # Move right: need to face Right (0)
+        (0, 1): 1,   # Move down: need to face Down (1)
+        (-1, 0): 2,  # Move left: need to face Left (2)
+        (0, -1): 3   # Move up: need to face Up (3)
+    }
+
     def __init__(self, env):
         self.env = env
-        self.action_buffer = []
+        self.action_buffer = deque()
+        self._current_target = None  # Target of the drive whose turns are in action_buffer
         self.stuck_counter = {}  # Track how many times we tried the same action
         self.recent_failures = []  # Track recent failed forward attempts
         self.stuck_positions = {}  # Track how many times we replanned at same position
+        # loc_x_y -> (x, y) for every grid cell, so plan parsing is a dict lookup
+        self._coord_cache = {
+            sys.intern(f"loc_{x}_{y}"): (x, y)
+            for x in range(getattr(env, 'width', 0))
+            for y in range(getattr(env, 'height', 0))
+        }
 
         # Action mappings (matching MiniGrid action space)
         self.minigrid_to_pddl = {
@@ -353,7 +525,7 @@ class StateTranslator:
 
     def clear_buffer(self):
         """Clear the action buffer (used on replan)."""
-        self.action_buffer = []
+        self.action_buffer.clear()
 
     def coord_to_pddl(self, coord: Tuple[int, int]) -> str:
         """Convert (x,y) coordinate to PDDL location format loc_x_y"""
@@ -361,6 +533,9 @@ class StateTranslator:
 
     def pddl_to_coord(self, pddl_loc: str) -> Tuple[int, int]:
         """Convert PDDL location format loc_x_y to (x,y) coordinate"""
+        coord = self._coord_cache.get(pddl_loc)
+        if coord is not None:
+            return coord
         match = re.match(r'loc_(\d+)_(\d+)', pddl_loc)
         if match:
             return (int(match.group(1)), int(match.group(2)))
@@ -388,11 +563,11 @@ class StateTranslator:
         # So we don't need to return anything here - just indicate buffer has actions
         if self.action_buffer:
             # Return None to indicate buffer should be used (main loop pops directly)
-            target_pos = getattr(self, '_current_target', None)
+            target_pos = self._current_target
             return None, target_pos
         
         # Parse PDDL action
-        parts = pddl_action.replace('(', '').replace(')', '').split()
+        parts = pddl_action.translate(_PAREN_TRANS).split()
         action_type = parts[0] if parts else None
         
         # ========== DRIVE ACTION ==========
@@ -421,10 +596,8 @@ class StateTranslator:
                 # Check if already at target
                 if current_pos == target_pos:
                     # Reset stuck counters on success
-                    if hasattr(self, 'stuck_counter'):
-                        self.stuck_counter = {}
-                    if hasattr(self, 'recent_failures'):
-                        self.recent_failures = []
+                    self.stuck_counter.clear()
+                    self.recent_failures.clear()
                     return 6, target_pos
 
                 # Calculate required movement delta
@@ -433,21 +606,8 @@ class StateTranslator:
 
                 print(f"[TRANSLATE] Drive: {current_pos} → {target_pos}, delta=({dx},{dy}), current_dir={current_dir}")
 
-                # Map movement delta to MiniGrid direction
-                # MiniGrid convention:
-                # 0 = Right (+1, 0)
-                # 1 = Down  (0, +1)
-                # 2 = Left  (-1, 0)
-                # 3 = Up    (0, -1)
-
-                direction_map = {
-                    (1, 0): 0,   # Move right: need to face Right (0)
-                    (0, 1): 1,   # Move down: need to face Down (1)
-                    (-1, 0): 2,  # Move left: need to face Left (2)
-                    (0, -1): 3   # Move up: need to face Up (3)
-                }
-
-                required_dir = direction_map.get((dx, dy))
+                # Map movement delta to MiniGrid direction (built once, on the class)
+                required_dir = self.direction_map.get((dx, dy))
 
                 if required_dir is None:
                     print(f"[TRANSLATE] ERROR: Invalid delta ({dx}, {dy}) - must be unit move (distance=1)")
@@ -473,10 +633,10 @@ class StateTranslator:
 
                 # CRITICAL FIX: Store ALL actions in buffer (not actions[1:])
                 # The main loop will pop from buffer, so we need ALL actions there
-                self.action_buffer = actions.copy()
+                self.action_buffer = deque(actions)
                 self._current_target = target_pos  # Store target for buffer pops
 
-                print(f"[TRANSLATE] Action sequence: {actions}, buffer populated with all: {self.action_buffer}")
+                print(f"[TRANSLATE] Action sequence: {actions}, buffer populated with all: {list(self.action_buffer)}")
 
                 # Return None to indicate buffer is populated (main loop will pop from buffer)
                 return None, target_pos
@@ -502,6 +662,15 @@ class StateTranslator:
         return self.minigrid_to_pddl.get(action_id, "unknown")
 
 
+# Entity name -> small int id, so visual-memory keys pack into a single int
+_ENTITY_IDS = {}
+
+
+def entity_key(x, y, name) -> int:
+    """Packed visual-memory key for entity `name` seen at (x, y): x<<48 | y<<32 | name id."""
+    return (int(x) << 48) | (int(y) << 32) | _ENTITY_IDS.setdefault(name, len(_ENTITY_IDS))
+
+
 def detect_new_entities(mock_agent, forbidden_entities: List[str], env, visual_memory: Set = None) -> Optional[Dict]:
     """
     Detect new entities in the environment that the agent can see.
@@ -510,7 +679,7 @@ def detect_new_entities(mock_agent, forbidden_entities: List[str], env, visual_m
         mock_agent: Mock agent object (for compatibility)
         forbidden_entities: List of entities to ignore (e.g., ['victory'])
         env: MiniGrid environment
-        visual_memory: Set of previously seen entity positions
+        visual_memory: Set of entity_key() ints for previously seen entities
 
     Returns:
         Dict with new entity info, or None if no new entities
@@ -533,8 +702,7 @@ def detect_new_entities(mock_agent, forbidden_entities: List[str], env, visual_m
                 continue
             if entity_name in forbidden_entities:
                 continue
-            entity_key = (pos[0], pos[1], entity_name)
-            if entity_key not in visual_memory:
+            if entity_key(pos[0], pos[1], entity_name) not in visual_memory:
                 return obj
 
     # Fallback: minimal local visibility (front + adjacent)
@@ -559,8 +727,7 @@ def detect_new_entities(mock_agent, forbidden_entities: List[str], env, visual_m
             entity_name = cell.name
             if entity_name in forbidden_entities:
                 continue
-            entity_key = (pos[0], pos[1], entity_name)
-            if entity_key not in visual_memory:
+            if entity_key(pos[0], pos[1], entity_name) not in visual_memory:
                 return {
                     'name': entity_name,
                     'position': pos,
@@ -3,6 +3,8 @@ State Manager - Tracks the robot's beliefs about the world state in memory.
 Only flushes to PDDL file when needed (before replanning).
 """
 
+from functools import lru_cache
+
 
 def scale_price_to_int(raw_price) -> int:
     """
@@ -29,6 +31,31 @@ def scale_price_to_int(raw_price) -> int:
         return 0
 
 
+@lru_cache(maxsize=4096)
+def to_pddl(atom) -> str:
+    """
+    Serialize a predicate atom to PDDL text.
+
+    Atoms are tuples like ('blocked', 'loc_3_4'); strings are passed through
+    so facts with nested terms (e.g. numeric fluents) can still be stored.
+    Replans serialize mostly the same atoms every time, so each is formatted once.
+    """
+    if isinstance(atom, str):
+        return atom
+    return "(" + " ".join(atom) + ")"
+
+
+def to_atom(fact):
+    """Convert a flat PDDL fact string like "(door-open d1)" to a tuple atom."""
+    if isinstance(fact, tuple):
+        return fact
+    body = fact.strip()[1:-1]
+    if "(" in body:
+        # Nested terms don't fit the flat tuple form - keep the text as-is
+        return fact
+    return tuple(body.split())
+
+
 class StateManager:
     """
     Manages the robot's belief state about the world.
@@ -39,9 +66,12 @@ class StateManager:
         # Core state tracking
         self.agent_pos = (1, 1)
         self.discovered_objects = {}  # name -> {'pos': (x,y), 'type': 'store', 'properties': {...}}
+        self._store_positions = None  # Cached frozenset for store_positions, reset on discovery
+        self._store_names_by_pos = None  # Cached (x, y) -> store name index, reset on discovery
+        self.store_price_index = {}  # name -> price, for discovered objects that have a price
 
-        # Generic dynamic facts (for future extensibility)
-        self.dynamic_facts = set()  # e.g., "(door-open d1)", "(has agent key1)"
+        # Generic dynamic facts (for future extensibility), stored as tuple atoms
+        self.dynamic_facts = set()  # e.g., ('door-open', 'd1'), ('has', 'agent', 'key1')
 
         # Static facts that are set once (walls, connections)
         self.static_facts = set()
@@ -50,25 +80,52 @@ class StateManager:
         """Update the agent's current position in belief state."""
         self.agent_pos = pos
 
+    @property
+    def store_positions(self):
+        """Frozenset of (x, y) positions of discovered stores (rebuilt only after a discovery)."""
+        if self._store_positions is None:
+            self._store_positions = frozenset(self._store_index())
+        return self._store_positions
+
+    def store_at(self, pos):
+        """Name of the discovered store at (x, y), or None."""
+        return self._store_index().get(pos)
+
+    def _store_index(self):
+        """(x, y) -> store name; the first store discovered at a position wins."""
+        if self._store_names_by_pos is None:
+            index = {}
+            for name, obj in self.discovered_objects.items():
+                if obj.get('type') == 'store' and 'pos' in obj:
+                    index.setdefault(tuple(obj['pos']), name)
+            self._store_names_by_pos = index
+        return self._store_names_by_pos
+
     def add_discovery(self, name, pos, obj_type='store', **properties):
         """Add a newly discovered object to the belief state."""
+        self._store_positions = None
+        self._store_names_by_pos = None
         self.discovered_objects[name] = {
             'pos': pos,
             'type': obj_type,
             'properties': properties
         }
+        if 'price' in properties:
+            self.store_price_index[name] = properties['price']
+        else:
+            self.store_price_index.pop(name, None)
 
         # Handle object registration based on type
         if obj_type == 'store':
             # For stores: register as object first, then add properties
             # Note: We assume the patcher has access to register objects
             # For now, we just add the facts - the objects should be pre-registered
-            self.dynamic_facts.add(f"(at_store {name} loc_{pos[0]}_{pos[1]})")
+            self.dynamic_facts.add(('at_store', name, f"loc_{pos[0]}_{pos[1]}"))
             # CRITICAL: Always add (selling {name} milk) for stores - required for buy action!
             # The planner needs this predicate to know the store sells milk, otherwise
             # the buy action precondition fails and the planner won't route to the store.
             # We add this regardless of whether 'price' exists in properties.
-            self.dynamic_facts.add(f"(selling {name} milk)")
+            self.dynamic_facts.add(('selling', name, 'milk'))
             
             # NOTE: item-price predicates are currently not added to PDDL.
             # If prices need to be added to PDDL in the future, use:
@@ -78,34 +135,41 @@ class StateManager:
             # Price information is currently handled in Python logic only.
         elif obj_type in ['obstacle', 'wall']:
             # For obstacles/walls: only add blocking predicate, no object registration needed
-            self.dynamic_facts.add(f"(blocked loc_{pos[0]}_{pos[1]})")
+            self.dynamic_facts.add(('blocked', f"loc_{pos[0]}_{pos[1]}"))
 
     def add_generic_fact(self, fact):
-        """Add a generic dynamic fact (for future proofing)."""
-        self.dynamic_facts.add(fact)
+        """Add a generic dynamic fact (for future proofing). Accepts a PDDL string or tuple."""
+        self.dynamic_facts.add(to_atom(fact))
 
     def remove_fact(self, fact_pattern):
-        """Remove facts matching a pattern."""
-        self.dynamic_facts = {f for f in self.dynamic_facts if fact_pattern not in f}
+        """Remove facts whose PDDL text contains a pattern."""
+        self.dynamic_facts = {f for f in self.dynamic_facts if fact_pattern not in to_pddl(f)}
 
-    def get_current_state_predicates(self):
-        """Returns a list of PDDL strings representing current belief state."""
-        preds = []
+    def get_current_state_atoms(self):
+        """Returns a list of tuple atoms representing current belief state."""
+        atoms = []
 
         # 1. Agent Position (always current)
-        preds.append(f"(at_agent agent loc_{self.agent_pos[0]}_{self.agent_pos[1]})")
+        atoms.append(('at_agent', 'agent', f"loc_{self.agent_pos[0]}_{self.agent_pos[1]}"))
 
         # 2. Static facts (walls, connections - if any)
-        preds.extend(list(self.static_facts))
+        atoms.extend(self.static_facts)
 
         # 3. Dynamic facts (discovered objects, doors, inventory, etc.)
-        preds.extend(list(self.dynamic_facts))
+        atoms.extend(self.dynamic_facts)
 
-        return preds
+        return atoms
+
+    def get_current_state_predicates(self):
+        """Returns a list of PDDL strings representing current belief state."""
+        return [to_pddl(atom) for atom in self.get_current_state_atoms()]
 
     def reset(self, start_pos=(1, 1)):
         """Reset the state manager (for new episodes)."""
         self.agent_pos = start_pos
         self.discovered_objects = {}
+        self._store_positions = None
+        self._store_names_by_pos = None
+        self.store_price_index = {}
         self.dynamic_facts = set()
         # Keep static_facts as they don't change between episodes
@@ -88,25 +88,34 @@ class ExperimentLogger:
 
         self.logger.log(level, message, *args, **kwargs)
 
-    def debug(self, component: str, message: str):
-        """Log debug message."""
-        self._log(component, logging.DEBUG, message)
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Whether a message at this level reaches any output.
+
+        Lets callers skip building expensive debug messages (the console
+        shows INFO and above, the file shows log_level and above).
+        """
+        return level >= min(logging.INFO, self.log_level)
+
+    def debug(self, component: str, message: str, *args):
+        """Log debug message (%-style args are formatted only if it is emitted)."""
+        self._log(component, logging.DEBUG, message, *args)
 
-    def info(self, component: str, message: str):
-        """Log info message."""
-        self._log(component, logging.INFO, message)
+    def info(self, component: str, message: str, *args):
+        """Log info message (%-style args are formatted only if it is emitted)."""
+        self._log(component, logging.INFO, message, *args)
 
-    def warning(self, component: str, message: str):
-        """Log warning message."""
-        self._log(component, logging.WARNING, message)
+    def warning(self, component: str, message: str, *args):
+        """Log warning message (%-style args are formatted only if it is emitted)."""
+        self._log(component, logging.WARNING, message, *args)
 
-    def error(self, component: str, message: str):
-        """Log error message."""
-        self._log(component, logging.ERROR, message)
+    def error(self, component: str, message: str, *args):
+        """Log error message (%-style args are formatted only if it is emitted)."""
+        self._log(component, logging.ERROR, message, *args)
 
-    def critical(self, component: str, message: str):
-        """Log critical message."""
-        self._log(component, logging.CRITICAL, message)
+    def critical(self, component: str, message: str, *args):
+        """Log critical message (%-style args are formatted only if it is emitted)."""
+        self._log(component, logging.CRITICAL, message, *args)
 
     def log_experiment_start(self, scenario_name: str, parameters: dict):
         """Log the start of an experiment."""
@@ -175,25 +184,25 @@ def init_logger(log_file: str = "trace.log", log_level: int = logging.DEBUG) ->
     return _logger_instance
 
 # Convenience functions for easy access
-def debug(component: str, message: str):
+def debug(component: str, message: str, *args):
     """Convenience function for debug logging."""
-    get_logger().debug(component, message)
+    get_logger().debug(component, message, *args)
 
-def info(component: str, message: str):
+def info(component: str, message: str, *args):
     """Convenience function for info logging."""
-    get_logger().info(component, message)
+    get_logger().info(component, message, *args)
 
-def warning(component: str, message: str):
+def warning(component: str, message: str, *args):
     """Convenience function for warning logging."""
-    get_logger().warning(component, message)
+    get_logger().warning(component, message, *args)
 
-def error(component: str, message: str):
+def error(component: str, message: str, *args):
     """Convenience function for error logging."""
-    get_logger().error(component, message)
+    get_logger().error(component, message, *args)
 
-def critical(component: str, message: str):
+def critical(component: str, message: str, *args):
     """Convenience function for critical logging."""
-    get_logger().critical(component, message)
+    get_logger().critical(component, message, *args)
 
 
 # Test the logger
@@ -131,11 +131,10 @@ def test_full_chain():
     with open("problem.pddl", "r") as f:
         pddl_content = f.read()
 
-    # Check for expected predicates
+    # Check for expected predicates (item-price facts are not written to PDDL, see StateManager)
     checks = [
-        f"(at {fake_discovery['name']} loc_{fake_discovery['position'][0]}_{fake_discovery['position'][1]})",
-        f"(selling {fake_discovery['name']} milk)",
-        f"(= (item-price milk {fake_discovery['name']}) {analysis_result['estimated_price']})"
+        f"(at_store {fake_discovery['name']} loc_{fake_discovery['position'][0]}_{fake_discovery['position'][1]})",
+        f"(selling {fake_discovery['name']} milk)"
     ]
 
     for check in checks: